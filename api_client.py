@@ -0,0 +1,129 @@
+"""
+Backend transport for the Streamlit frontend.
+
+One BackendTransport per process owns an httpx.AsyncClient (a single
+shared connection pool) running on a background event loop thread. Script
+threads hand requests to that loop and wait only for their own result,
+and a background task polls /health so pages can read the backend status
+without making a request.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+
+import httpx
+
+# Chat turns can include a slow Gemini call plus a retry; everything else should be quick
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "30"))
+STATIC_TIMEOUT = float(os.getenv("STATIC_TIMEOUT", "5"))
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "2"))
+HEALTH_POLL_INTERVAL = float(os.getenv("HEALTH_POLL_INTERVAL", "10"))  # seconds while healthy
+HEALTH_RETRY_INTERVAL = 2.0  # seconds while the backend is down
+
+class BackendTransport:
+    """Shared async HTTP client for the backend, driven from a background event loop."""
+
+    def __init__(self, base_url, poll_interval=HEALTH_POLL_INTERVAL):
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.status = "unknown"
+        self.last_health_check = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="backend-transport", daemon=True)
+        self._thread.start()
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(STATIC_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+        )
+        self.submit(self._poll_health())
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the transport loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def request(self, method, path, json=None, timeout=STATIC_TIMEOUT, headers=None):
+        """Send a request and wait for the fully read response."""
+        return self.submit(self._request(method, path, json, timeout, headers)).result()
+
+    def request_in_background(self, method, path, json=None, timeout=STATIC_TIMEOUT):
+        """Send a request without waiting for it; failures are only logged."""
+        future = self.submit(self._request(method, path, json, timeout))
+        future.add_done_callback(self._log_background_failure)
+        return future
+
+    def open_stream(self, path, json=None, timeout=CHAT_TIMEOUT):
+        """POST to a streaming endpoint.
+
+        Returns (status_code, lines) where lines is an iterator over the
+        response body's lines as they arrive. Transport errors are raised
+        either here or while iterating.
+        """
+        events = queue.Queue()
+
+        async def pump():
+            try:
+                async with self._client.stream("POST", path, json=json, timeout=self._timeout(timeout)) as response:
+                    events.put(("status", response.status_code))
+                    if response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            events.put(("line", line))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                events.put(("end", None))
+
+        self.submit(pump())
+
+        kind, value = events.get()
+        if kind == "error":
+            raise value
+        if kind == "end":
+            raise httpx.RemoteProtocolError("Stream closed before a response arrived")
+
+        def lines():
+            while True:
+                kind, value = events.get()
+                if kind == "line":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+
+        return value, lines()
+
+    def report(self, status):
+        """Record the backend status observed by a regular request."""
+        self.status = status
+
+    async def _request(self, method, path, json, timeout, headers=None):
+        response = await self._client.request(method, path, json=json, headers=headers, timeout=self._timeout(timeout))
+        await response.aread()
+        return response
+
+    @staticmethod
+    def _timeout(timeout):
+        return httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+
+    @staticmethod
+    def _log_background_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Background request failed: {future.exception()}")
+
+    async def _poll_health(self):
+        """Keep self.status up to date by polling /health."""
+        while True:
+            try:
+                response = await self._client.get("/health", timeout=self._timeout(STATIC_TIMEOUT))
+                self.status = "connected" if response.status_code == 200 else "disconnected"
+            except httpx.HTTPError:
+                self.status = "disconnected"
+            self.last_health_check = time.time()
+
+            await asyncio.sleep(self.poll_interval if self.status == "connected" else HEALTH_RETRY_INTERVAL)
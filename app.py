@@ -8,17 +8,19 @@ import httpx
 import time
 import json
 from datetime import datetime
-import random
+import uuid
 import os
 from dotenv import load_dotenv
-import asyncio
 from contextlib import contextmanager
 
+from api_client import BackendTransport, CHAT_TIMEOUT, STATIC_TIMEOUT
+
 # Load environment variables
 load_dotenv()
 
 # Constants - Dynamic backend URL for deployment
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")  # FastAPI backend URL
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"  # Render replies as they arrive
 
 # Simple performance monitoring
 @contextmanager
@@ -40,14 +42,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# HTTP client with connection pooling and timeout
+# One async transport (connection pool + background health poller) per process
 @st.cache_resource
-def get_http_client():
-    """Create a persistent HTTP client with connection pooling."""
-    return httpx.Client(
-        timeout=httpx.Timeout(5.0, connect=2.0),  # Faster timeouts for quicker responses
-        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
-    )
+def get_transport():
+    """Create the shared backend transport."""
+    return BackendTransport(BACKEND_URL)
 
 # Load custom CSS only once
 @st.cache_data
@@ -66,7 +65,8 @@ def init_session_state():
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "session_id" not in st.session_state:
-        st.session_state.session_id = str(random.randint(1000, 9999))
+        # Unguessable, since the id alone selects a user's history on the backend
+        st.session_state.session_id = uuid.uuid4().hex
     if "user_profile_set" not in st.session_state:
         st.session_state.user_profile_set = False
     if "current_assessment" not in st.session_state:
@@ -85,8 +85,6 @@ def init_session_state():
         st.session_state.performance_metrics = []
     if "backend_status" not in st.session_state:
         st.session_state.backend_status = "unknown"
-    if "health_check_counter" not in st.session_state:
-        st.session_state.health_check_counter = 0
     
     # User profile
     if "user_profile" not in st.session_state:
@@ -110,15 +108,18 @@ def reset_session_state():
     init_session_state()
 
 # API client with timeout and error handling
-def safe_api_call(endpoint, data=None, method="GET"):
+def safe_api_call(endpoint, data=None, method="GET", timeout=None, headers=None):
     """Make API calls with proper error handling and loading indicators."""
-    client = get_http_client()
+    transport = get_transport()
+    if timeout is None:
+        # Chat turns wait on Gemini; static endpoints should answer quickly
+        timeout = CHAT_TIMEOUT if endpoint == "chat" else STATIC_TIMEOUT
     
     try:
-        if method == "GET":
-            response = client.get(f"{BACKEND_URL}/{endpoint}")
-        else:
-            response = client.post(f"{BACKEND_URL}/{endpoint}", json=data)
+        response = transport.request(
+            method, f"/{endpoint}", json=data if method != "GET" else None, timeout=timeout, headers=headers
+        )
+        transport.report("connected")
         
         if response.status_code == 200:
             st.session_state.backend_status = "connected"
@@ -129,22 +130,123 @@ def safe_api_call(endpoint, data=None, method="GET"):
     except httpx.TimeoutException:
         st.session_state.backend_status = "disconnected"
         return None, "Request timed out. Please try again."
+    except httpx.ConnectError:
+        st.session_state.backend_status = "disconnected"
+        transport.report("disconnected")
+        return None, "Cannot connect to server. Please check if the backend is running."
+    except Exception as e:
+        st.session_state.backend_status = "disconnected"
+        return None, f"Error: {str(e)}"
+
+# Streaming chat call - renders the reply incrementally as chunks arrive
+def stream_chat_response(message):
+    """Stream a chat reply from the backend into an assistant bubble.
+    
+    Returns the final /chat payload and an error message, like safe_api_call.
+    """
+    payload = {"message": message, "session_id": st.session_state.session_id}
+    
+    # The bubble sits in a slot so a failed stream can be removed without a rerun
+    slot = st.empty()
+    with slot.container():
+        with st.chat_message("assistant", avatar="💙"):
+            placeholder = st.empty()
+            placeholder.write("🤔 Thinking...")
+            result, error = read_chat_stream(payload, placeholder)
+    
+    if error:
+        slot.empty()
+    return result, error
+
+def read_chat_stream(payload, placeholder):
+    """Read /chat/stream events, writing the reply into placeholder as it grows."""
+    transport = get_transport()
+    streamed_text = ""
+    result = None
+    
+    try:
+        status_code, lines = transport.open_stream("/chat/stream", json=payload, timeout=CHAT_TIMEOUT)
+        if status_code != 200:
+            st.session_state.backend_status = "connected"
+            return None, f"API Error: {status_code}"
+        
+        for line in lines:
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "chunk":
+                streamed_text += event["text"]
+                placeholder.write(streamed_text + "▌")
+            elif event["type"] == "done":
+                result = event
+        
+        st.session_state.backend_status = "connected"
+    except httpx.TimeoutException:
+        st.session_state.backend_status = "disconnected"
+        return None, "Request timed out. Please try again."
     except httpx.ConnectError:
         st.session_state.backend_status = "disconnected"
         return None, "Cannot connect to server. Please check if the backend is running."
     except Exception as e:
         st.session_state.backend_status = "disconnected"
         return None, f"Error: {str(e)}"
+    
+    if result is None:
+        return None, "The response was interrupted. Please try again."
+    
+    placeholder.write(result["response"])
+    return result, None
+
+# Session catalogue (questionnaires, crisis resources, coping strategies), shared by every session
+@st.cache_resource
+def get_catalogue_cache():
+    """Process-wide copy of the catalogue with its ETag and expiry time."""
+    return {"catalogue": None, "etag": None, "expires": 0.0}
+
+def remember_catalogue(catalogue, etag, max_age):
+    """Store a catalogue received from the backend."""
+    cache = get_catalogue_cache()
+    cache["catalogue"] = catalogue
+    cache["etag"] = etag
+    cache["expires"] = time.time() + max_age
+
+def max_age_from(cache_control):
+    """Read max-age seconds from a Cache-Control header (0 if absent)."""
+    for directive in (cache_control or "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name == "max-age" and value.isdigit():
+            return int(value)
+    return 0
+
+def load_catalogue():
+    """Return the session catalogue, revalidating the cached copy once it goes stale."""
+    cache = get_catalogue_cache()
+    if cache["catalogue"] is not None and time.time() < cache["expires"]:
+        return cache["catalogue"], None
+    
+    headers = {"If-None-Match": cache["etag"]} if cache["catalogue"] is not None else None
+    try:
+        response = get_transport().request("GET", "/session/bootstrap", headers=headers)
+    except httpx.HTTPError as e:
+        if cache["catalogue"] is not None:
+            return cache["catalogue"], None  # Stale, but the catalogue rarely changes
+        return None, f"Error: {str(e)}"
+    
+    max_age = max_age_from(response.headers.get("Cache-Control"))
+    if response.status_code == 304:
+        remember_catalogue(cache["catalogue"], cache["etag"], max_age)
+    elif response.status_code == 200:
+        remember_catalogue(response.json(), response.headers.get("ETag"), max_age)
+    else:
+        return None, f"API Error: {response.status_code}"
+    return cache["catalogue"], None
 
-# Cached API calls for questions
-@st.cache_data(ttl=300)  # Cache for 5 minutes
 def get_assessment_questions(assessment_type):
-    """Get assessment questions with caching."""
-    endpoint = f"{assessment_type}-questions"
-    data, error = safe_api_call(endpoint)
+    """Get assessment questions from the cached catalogue."""
+    catalogue, error = load_catalogue()
     if error:
         return None, error
-    return data.get("questions", []), None
+    return catalogue["assessments"][assessment_type]["questions"], None
 
 # User onboarding
 def user_onboarding():
@@ -209,7 +311,7 @@ def user_onboarding():
                     st.session_state.user_goals = goals
                     st.session_state.user_mood = mood
                     
-                    # Save profile to backend
+                    # Save profile to backend, fetching the catalogue in the same call unless we have it
                     profile_data = {
                         "name": name,
                         "age": age,
@@ -217,11 +319,17 @@ def user_onboarding():
                         "current_mood": mood
                     }
                     
-                    result, error = safe_api_call("set-profile", profile_data, "POST")
+                    catalogue_etag = get_catalogue_cache()["etag"]
+                    result, error = safe_api_call(
+                        "session/bootstrap", {**profile_data, "session_id": st.session_state.session_id}, "POST",
+                        headers={"If-None-Match": catalogue_etag} if catalogue_etag else None
+                    )
                     
                     if error:
                         st.error(f"Failed to save profile: {error}")
                         return
+                    if "catalogue" in result:
+                        remember_catalogue(result["catalogue"], result["catalogue_etag"], result["catalogue_max_age"])
                     
                     # Add welcome message
                     welcome_message = f"Hi {name}! It's great to meet you. I'm here to support you with your mental well-being. How can I help you today?"
@@ -239,28 +347,40 @@ def user_onboarding():
             else:
                 st.error("Please fill in your name and select at least one goal.")
 
+# Render a single chat message
+def render_message(message):
+    """Render one transcript entry."""
+    if message["role"] == "user":
+        with st.chat_message("user", avatar="👤"):
+            st.write(f"{message['content']}")
+    elif message["role"] == "assistant":
+        with st.chat_message("assistant", avatar="💙"):
+            st.write(f"{message['content']}")
+    elif message["role"] == "system":
+        st.info(message["content"])
+
 # Display chat messages with performance optimization
 def display_chat():
+    """Render the transcript; returns (container, caption slot) so new turns can be appended in place."""
     # Chat container
     chat_container = st.container()
+    # Reserved below the container, so the caption stays under turns added later in this run
+    caption_slot = st.empty()
     
     with chat_container:
         # Display only the last 30 messages for performance
         recent_messages = st.session_state.messages[-30:] if len(st.session_state.messages) > 30 else st.session_state.messages
         
         for message in recent_messages:
-            if message["role"] == "user":
-                with st.chat_message("user", avatar="👤"):
-                    st.write(f"{message['content']}")
-            elif message["role"] == "assistant":
-                with st.chat_message("assistant", avatar="💙"):
-                    st.write(f"{message['content']}")
-            elif message["role"] == "system":
-                st.info(message["content"])
-        
-        # Show message count if there are more than 30 messages
-        if len(st.session_state.messages) > 30:
-            st.caption(f"Showing last 30 of {len(st.session_state.messages)} messages")
+            render_message(message)
+    
+    show_message_count(caption_slot)
+    return chat_container, caption_slot
+
+def show_message_count(caption_slot):
+    """Show the message count below the transcript if there are more than 30 messages."""
+    if len(st.session_state.messages) > 30:
+        caption_slot.caption(f"Showing last 30 of {len(st.session_state.messages)} messages")
 
 # Process and display assessment
 def process_assessment(assessment_type, questions):
@@ -290,7 +410,8 @@ def process_assessment(assessment_type, questions):
         with st.spinner("Processing your assessment..."):
             assessment_data = {
                 "assessment_type": assessment_type,
-                "responses": responses
+                "responses": responses,
+                "session_id": st.session_state.session_id
             }
             
             # API call to process assessment
@@ -369,11 +490,16 @@ def display_sidebar():
             for i, (mood, value) in enumerate(mood_options.items()):
                 with cols[i]:
                     if st.button(mood, key=f"mood_{i}"):
-                        st.session_state.mood_history.append({
+                        mood_entry = {
                             "mood": mood.split(" ")[1],
                             "value": value,
                             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-                        })
+                        }
+                        st.session_state.mood_history.append(mood_entry)
+                        # Keep the backend's copy of the mood history in sync without waiting for it
+                        get_transport().request_in_background(
+                            "POST", "/mood", json={**mood_entry, "session_id": st.session_state.session_id}
+                        )
                         st.session_state.messages.append({
                             "role": "system",
                             "content": f"You selected a mood: {mood}"
@@ -425,18 +551,10 @@ def display_sidebar():
 
 # Health check function
 def check_backend_health():
-    """Check if backend is healthy and responsive."""
-    try:
-        client = get_http_client()
-        response = client.get(f"{BACKEND_URL}/docs", timeout=2.0)
-        if response.status_code == 200:
-            st.session_state.backend_status = "connected"
-            return True
-    except:
-        pass
-    
-    st.session_state.backend_status = "disconnected"
-    return False
+    """Return whether the backend is healthy, as last seen by the background poller."""
+    status = get_transport().status
+    st.session_state.backend_status = status
+    return status == "connected"
 
 # Main app function
 def main():
@@ -445,13 +563,8 @@ def main():
     st.markdown(css_style, unsafe_allow_html=True)
     init_session_state()
 
-    # Check backend health periodically (every 10 page loads)
-    if 'health_check_counter' not in st.session_state:
-        st.session_state.health_check_counter = 0
-
-    st.session_state.health_check_counter += 1
-    if st.session_state.health_check_counter % 10 == 1:
-        check_backend_health()
+    # Backend health is polled in the background, so reading it is free
+    check_backend_health()
 
     # Add a reset button in developer mode (hidden in sidebar footer)
     with st.sidebar:
@@ -476,82 +589,98 @@ def main():
                 st.session_state.current_assessment["questions"]
             )
         else:
-            # Chat input with immediate display using Streamlit's natural refresh cycle
+            # Chat input is pinned to the bottom of the page whatever the call order
             user_input = st.chat_input("Type your message here... (Press Enter to send)")
 
-            # Handle new user input FIRST
-            if user_input:
-                # Add user message to state
+            # Display the transcript so far
+            chat_container, caption_slot = display_chat()
+
+            # Render a new turn in place, at the end of the transcript, instead of rerunning the whole page
+            with chat_container:
+                if user_input:
+                    user_message = {
+                        "role": "user", 
+                        "content": user_input, 
+                        "time": datetime.now().strftime("%H:%M")
+                    }
+                    st.session_state.messages.append(user_message)
+                    render_message(user_message)
+
+                # Respond to the last user message (also picks up a turn interrupted by a rerun)
+                if (st.session_state.messages and 
+                    st.session_state.messages[-1]["role"] == "user" and 
+                    not st.session_state.get('processing_response', False)):
+                    respond_to_user(st.session_state.messages[-1]["content"])
+
+            show_message_count(caption_slot)
+
+def respond_to_user(last_user_message):
+    """Get the assistant's reply to a user message and render it below the transcript."""
+    # Set processing flag to prevent duplicate calls
+    st.session_state.processing_response = True
+    first_new_message = len(st.session_state.messages)
+
+    try:
+        # Send to backend and get response
+        if STREAM_RESPONSES:
+            with timer():
+                response, error = stream_chat_response(last_user_message)
+        else:
+            with st.spinner("🤔 Thinking..."):
+                with timer():
+                    response, error = safe_api_call(
+                        "chat", 
+                        {"message": last_user_message, "session_id": st.session_state.session_id},
+                        "POST"
+                    )
+
+        if error:
+            st.error(error)
+            # Add fallback message for offline mode
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": "I'm having trouble connecting to my brain right now. Please try again in a moment, or if this persists, check that the backend server is running.",
+                "time": datetime.now().strftime("%H:%M")
+            })
+        else:
+            # Check for crisis mode
+            if response.get("is_crisis", False):
+                st.session_state.crisis_mode = True
+
+            # Add assistant response
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": response["response"],
+                "time": datetime.now().strftime("%H:%M")
+            })
+            if STREAM_RESPONSES:
+                # Already rendered while streaming
+                first_new_message += 1
+
+            # Check for suggested assessment
+            if "suggested_assessment" in response:
+                assessment = response["suggested_assessment"]
+                assessment_message = f"Would you like to take a quick {assessment['name']}? It can help me better understand what you're experiencing."
                 st.session_state.messages.append({
-                    "role": "user", 
-                    "content": user_input, 
+                    "role": "assistant", 
+                    "content": assessment_message,
                     "time": datetime.now().strftime("%H:%M")
                 })
-                # Force immediate rerun to show the user's message
-                st.rerun()
-
-            # Display chat messages
-            display_chat()
-
-            # Check if we need to process a response (when last message is user message and no processing flag)
-            if (st.session_state.messages and 
-                st.session_state.messages[-1]["role"] == "user" and 
-                not st.session_state.get('processing_response', False)):
-
-                # Set processing flag to prevent duplicate calls
-                st.session_state.processing_response = True
-
-                # Get the last user message
-                last_user_message = st.session_state.messages[-1]["content"]
-
-                # Send to backend and get response
-                with st.spinner("🤔 Thinking..."):
-                    with timer():
-                        response, error = safe_api_call(
-                            "chat", 
-                            {"message": last_user_message, "session_id": st.session_state.session_id},
-                            "POST"
-                        )
-
-                if error:
-                    st.error(error)
-                    # Add fallback message for offline mode
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": "I'm having trouble connecting to my brain right now. Please try again in a moment, or if this persists, check that the backend server is running.",
-                        "time": datetime.now().strftime("%H:%M")
-                    })
-                else:
-                    # Check for crisis mode
-                    if response.get("is_crisis", False):
-                        st.session_state.crisis_mode = True
-
-                    # Add assistant response
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": response["response"],
-                        "time": datetime.now().strftime("%H:%M")
-                    })
+                st.session_state.current_assessment = {
+                    "type": assessment["type"],
+                    "questions": assessment["questions"]
+                }
+    finally:
+        # Clear processing flag
+        st.session_state.processing_response = False
 
-                    # Check for suggested assessment
-                    if "suggested_assessment" in response:
-                        assessment = response["suggested_assessment"]
-                        assessment_message = f"Would you like to take a quick {assessment['name']}? It can help me better understand what you're experiencing."
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "content": assessment_message,
-                            "time": datetime.now().strftime("%H:%M")
-                        })
-                        st.session_state.current_assessment = {
-                            "type": assessment["type"],
-                            "questions": assessment["questions"]
-                        }
+    # Append only the new messages to what is already on screen
+    for message in st.session_state.messages[first_new_message:]:
+        render_message(message)
 
-                # Clear processing flag
-                st.session_state.processing_response = False
-                
-                # Force rerun to show the assistant's response immediately
-                st.rerun()
+    # Switching to the assessment view is the only case that needs a full rerun
+    if st.session_state.current_assessment:
+        st.rerun()
 
 if __name__ == "__main__":
     main()
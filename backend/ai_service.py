@@ -1,20 +1,56 @@
 """Gemini AI integration for the mental health chatbot with poetry support."""
 
 import os
+import re
 import json
+import time
 import random
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 
+from backend.analysis import analyze_message
+from backend.context_cache import GEMINI_CONTEXT_CACHE, ContextCacheRegistry
+from backend.context_window import build_history_window
+from backend.conversation_log import CONVERSATION_LOG_DIR, ConversationLog
+from backend.keywords import match_keywords
+from backend.metrics import CHAT_RESPONSES, stage_timer
+from backend.profiles import DEFAULT_PROFILE, UserProfileRecord
+from backend.prompts import estimate_tokens
+from backend.responses import (
+    COMFORT_RESPONSE, CRISIS_RESPONSE, FALLBACK_RESPONSES, HEALING_POEMS, POEM_INTROS,
+    age_group, personalize, pick_response
+)
+from backend.response_cache import NAME_PLACEHOLDER, RESPONSE_CACHE_ENABLED, ResponseCache
+from backend.session_store import create_session_store
+
 # Load environment variables
 load_dotenv()
 
 # Get API key
 API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Optional override of the Gemini API endpoint (e.g. the local fake server in bench/)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+# Moods offered by the onboarding form, pre-compiled into prompt templates at start-up
+WARM_UP_MOODS = ("Very bad", "Bad", "Neutral", "Good", "Very good", "unknown")
+WARM_UP_AGES = (10, 16, 30, 70)  # one age per prompt age bucket
+
 # Set test mode - force to false to try real API first
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
 
+# Maximum number of in-flight Gemini calls per worker
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+
+# Resilience settings for Gemini calls
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "8"))  # per-attempt deadline in seconds
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "1"))
+GEMINI_RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "0.25"))  # base delay in seconds
+GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "0"))  # seconds before a hedged request, 0 = off
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds before a trial call
+
 # Try to import the newer client first, fallback to the older one if not available
 try:
     from google import genai
@@ -23,8 +59,12 @@ try:
     print("Using newer Gemini client")
     
     if API_KEY:
-        client = genai.Client(api_key=API_KEY)
-        print("Gemini client initialized successfully")
+        if GEMINI_BASE_URL:
+            client = genai.Client(api_key=API_KEY, http_options=types.HttpOptions(base_url=GEMINI_BASE_URL))
+            print(f"Gemini client initialized against {GEMINI_BASE_URL}")
+        else:
+            client = genai.Client(api_key=API_KEY)
+            print("Gemini client initialized successfully")
     else:
         print("WARNING: GEMINI_API_KEY not found. Running in test mode.")
         TEST_MODE = True
@@ -37,7 +77,10 @@ except ImportError:
         print("Using older Gemini client")
         
         if API_KEY:
-            genai.configure(api_key=API_KEY)
+            if GEMINI_BASE_URL:
+                genai.configure(api_key=API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_BASE_URL})
+            else:
+                genai.configure(api_key=API_KEY)
             print("Gemini configured successfully")
         else:
             print("WARNING: GEMINI_API_KEY not found. Running in test mode.")
@@ -47,6 +90,53 @@ except ImportError:
         print("ERROR: Neither Gemini client package could be imported. Running in test mode.")
         TEST_MODE = True
 
+class CircuitBreaker:
+    """Stops calling the API after repeated failures, then lets one trial call through."""
+    
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+    
+    @property
+    def state(self):
+        """Return "closed", "open" or "half_open"."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow(self):
+        """Return True if a call may be made now."""
+        if self.opened_at is None:
+            return True
+        
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        
+        # Half-open: allow a single trial call at a time
+        if self._trial_started_at is None or now - self._trial_started_at >= self.reset_timeout:
+            self._trial_started_at = now
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+    
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_started_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"Circuit breaker open after {self.failures} failures - serving fallback responses")
+            self.opened_at = time.monotonic()
+            self._trial_started_at = None
+
 class GeminiAI:
     """Integration with Google's Gemini AI."""
     
@@ -70,142 +160,406 @@ class GeminiAI:
             self.test_mode = True
             print("Running in test mode with fallback responses")
             
-        self.chat_history = []
-        self.user_profile = {}
-        
-        # Healing poetry for therapeutic responses
-        self.healing_poems = {
-            "sadness_loneliness": [
-                "Even when the night feels long,\nthe stars are quietly shining for you.\nYou are never truly alone,\nthe world still whispers your name with love. 🌌",
-                "In the quiet of your sorrow,\ngentle light is waiting near.\nYour heart deserves tomorrow's hope,\nand love will always find you here. 💫",
-                "Though shadows dance around your soul,\nyour light can never truly fade.\nRest now in this gentle moment,\nyou are loved, you are not afraid. 🌙"
-            ],
-            "anxiety_stress": [
-                "Breathe in calm, breathe out the storm,\nyour heart is safe, your spirit warm.\nOne gentle step, one steady light,\nyou'll find your peace, your wings for flight. 🌬️🕊️",
-                "In the rush of worried thoughts,\nfind the stillness in your chest.\nYour breath can be your anchor now,\nguiding you to peaceful rest. 🌊",
-                "Let the rhythm of your heartbeat\nbe the song that calms your mind.\nIn this moment, you are safe here,\npeace and comfort you will find. 💙"
-            ],
-            "self_love": [
-                "Like flowers turning toward the sun,\nyour soul deserves to bloom.\nBe gentle with your roots today,\nthey are growing strength for tomorrow. 🌸",
-                "You are worthy of the kindness\nthat you give to everyone.\nTreat yourself with that same love,\nyou are precious, you are enough. 🌺",
-                "In the mirror of your heart,\nsee the beauty shining bright.\nYou deserve all love and care,\nyou are worthy of delight. ✨"
-            ],
-            "comfort_pampering": [
-                "Wrap yourself in words of care,\nlike a blanket soft and true.\nMay kindness be your steady song,\nand love always find you. 🧸💙",
-                "Let these words be gentle arms\nthat hold you close and tight.\nYou deserve this moment's peace,\neverything will be alright. 🤗",
-                "In this space of quiet comfort,\nfeel the warmth that surrounds you.\nYou are cherished, you are valued,\nlet this love gently astound you. 💕"
-            ],
-            "children_magical": [
-                "Little star, up in the sky ✨\nyou sparkle bright, and so do I.\nEven when clouds come rolling near,\nyour light will always shine clear. 🌈🌟",
-                "Magic lives inside your heart,\nbraver than the biggest bear.\nWhen you feel a little scared,\nremember love is everywhere. 🐻✨",
-                "You're a rainbow after rain,\na sunbeam bright and true.\nThe world is full of wonder,\nand it's lucky to have you. 🌈☀️"
-            ],
-            "breathing_relaxation": [
-                "Breathe in the light, let shadows fade,\na calm new space within is made.\nWith every breath, feel peace grow near,\nyou are safe, you are held here. 🌿",
-                "In and out, like gentle waves,\nyour breath can wash your fears away.\nLet this rhythm be your guide,\nto peace that's always here to stay. 🌊",
-                "Feel the air fill up your chest,\nlike love flowing through your soul.\nWith each breath, you're growing calm,\nfeeling peaceful, feeling whole. 💨💙"
-            ]
-        }
+        # Conversation history is kept per session_id with bounded memory,
+        # in-process or in a store shared between workers (SESSION_BACKEND)
+        self.sessions = create_session_store()
+        
+        # Opt-in append-only log so history survives restarts of in-memory sessions
+        self.conversation_log = ConversationLog() if CONVERSATION_LOG_DIR else None
+        
+        # Created lazily so it binds to the server's running event loop
+        self._inference_semaphore = None
+        
+        # Trips straight to fallback responses during provider incidents
+        self.breaker = CircuitBreaker()
+        
+        # Opt-in cache of completions for repeated short openers
+        self.response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+        
+        # Opt-in Gemini context caching of the static system prompt (new client only)
+        self.context_cache = None
+        if GEMINI_CONTEXT_CACHE and not self.test_mode and USE_NEW_CLIENT:
+            self.context_cache = ContextCacheRegistry(self.client, self.model_name)
         
     def _get_healing_poem(self, category, user_name="friend", user_age=25):
         """Get a healing poem for the specified emotional category."""
         if category == "children_magical" and user_age > 12:
             category = "comfort_pampering"  # Fallback for older users
         
-        poems = self.healing_poems.get(category, self.healing_poems["comfort_pampering"])
+        poems = HEALING_POEMS.get(category, HEALING_POEMS["comfort_pampering"])
         selected_poem = random.choice(poems)
         
         # Add a gentle introduction based on user age
-        if user_age <= 12:
-            intro = f"Here's something special for you, little {user_name} 🌟:\n\n"
-        elif user_age <= 19:
-            intro = f"Let me share something beautiful with you, {user_name} 💙:\n\n"
-        else:
-            intro = f"Here's a gentle poem for your heart, dear {user_name} 🌸:\n\n"
+        intro = personalize(POEM_INTROS[age_group(user_age)], user_name)
         
         return intro + selected_poem
+    
+    def warm_up(self):
+        """Do the one-off work of a first chat turn ahead of time.
         
-        # Fallback responses for test mode
-        self.fallback_responses = [
-            "I'm here to listen. Could you tell me more about how you're feeling?",
-            "That sounds challenging. What coping strategies have helped you in the past?",
-            "I understand this is difficult. Remember to take deep breaths and focus on one moment at a time.",
-            "Your feelings are valid. It's okay to ask for help when you need it.",
-            "Have you tried any relaxation techniques like deep breathing or progressive muscle relaxation?",
-            "Sometimes writing in a journal can help process complex emotions. Have you tried that?",
-            "Remember that self-care is important. What activities bring you joy?",
-            "I'm here to support you. Would it help to talk about specific strategies for managing stress?",
-            "It's brave of you to share your feelings. What would feel like a small win for you today?",
-            "Building a routine can help provide structure. What small healthy habits could you incorporate?"
-        ]
-    
-    def set_user_profile(self, profile_data):
-        """Set user profile information."""
-        self.user_profile = profile_data
-    
-    def get_response(self, user_message, is_crisis=False):
-        """Get AI response to user message with optimized performance."""
-        # Add user message to history
-        self.chat_history.append({"role": "user", "content": user_message})
-        
-        # Try real API first, fallback to test mode if needed
-        if not self.test_mode and API_KEY:
+        Compiles the prompt templates for every age bucket and onboarding mood
+        and runs the analysis and fallback paths once, so the first real
+        requests don't pay for it.
+        """
+        for age in WARM_UP_AGES:
+            for mood in WARM_UP_MOODS:
+                UserProfileRecord(age=age, current_mood=mood)
+        
+        analysis = analyze_message("Hello, I feel anxious and sad today")
+        self._get_fallback_response(analysis.text, analysis.is_crisis, None, analysis)
+        self.suggest_assessment(analysis=analysis)
+    
+    def set_user_profile(self, profile_data, session_id="default"):
+        """Set user profile information for a session."""
+        session = self.sessions.get(session_id)
+        # Derived values (age bucket, prompt templates) are computed once here
+        session.set_profile(UserProfileRecord.from_dict(profile_data))
+        self.sessions.save(session)
+    
+    def _get_profile(self, session):
+        """Return the session's profile, or the default profile if none was set."""
+        if session is not None and session.profile is not None:
+            return session.profile
+        return DEFAULT_PROFILE
+    
+    def record_mood(self, session_id, mood, value=None, timestamp=None):
+        """Record a mood check-in for a session."""
+        session = self.sessions.get(session_id)
+        session.add_mood(mood, value, timestamp)
+        self.sessions.save(session)
+    
+    def record_assessment(self, session_id, assessment_type, score, interpretation):
+        """Record a screening result for a session."""
+        session = self.sessions.get(session_id)
+        session.add_assessment(assessment_type, score, interpretation)
+        self.sessions.save(session)
+    
+    async def run_session_io(self, func, *args):
+        """Call func(*args), in a worker thread when the session store does blocking I/O."""
+        if self.sessions.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+    
+    def get_history(self, session_id):
+        """Return a snapshot of the chat history for a session."""
+        session = self.sessions.peek(session_id)
+        return list(session.history) if session else []
+    
+    def _start_turn(self, user_message, session_id, analysis=None):
+        """Record a user message in its session and return (session, analysis)."""
+        session = self.sessions.get(session_id)
+        if session.total_messages == 0 and self.conversation_log is not None:
+            self._restore_history(session)
+        if analysis is None:
+            analysis = analyze_message(user_message)
+        
+        # Add user message to history and update the session's keyword counters
+        self._add_message(session, "user", user_message)
+        session.record_analysis(analysis)
+        return session, analysis
+    
+    def _add_message(self, session, role, content):
+        """Add a message to the session history and the conversation log."""
+        session.add_message(role, content)
+        if self.conversation_log is not None:
+            # Log the stored (possibly truncated) content so a restore matches the session
+            self.conversation_log.append(session.session_id, role, session.history[-1]["content"])
+    
+    def _restore_history(self, session):
+        """Refill a new session with its last logged messages, if any."""
+        for message in self.conversation_log.restore(session.session_id):
+            session.add_message(message["role"], message["content"])
+    
+    async def get_response_async(self, user_message, is_crisis=False, session_id="default", analysis=None):
+        """Get AI response without blocking the event loop."""
+        session, analysis = await self.run_session_io(self._start_turn, user_message, session_id, analysis)
+        response = None
+        
+        # Try real API first, fallback to test mode (or while the breaker is open)
+        if not self.test_mode and API_KEY and self.breaker.allow():
             try:
-                return self._get_api_response(user_message, is_crisis)
+                response = await self._get_api_response_async(user_message, is_crisis, session, analysis)
             except Exception as e:
                 print(f"API failed, using fallback: {e}")
-                # Use fallback but don't switch to permanent test mode
         
-        # Use enhanced fallback responses
-        return self._get_fallback_response(user_message, is_crisis)
+        if response is None:
+            # Fallback responses are local and cheap, no need to leave the loop
+            response = self._get_fallback_response(user_message, is_crisis, session, analysis)
+        await self.run_session_io(self.sessions.save, session)
+        return response
     
-    def _get_api_response(self, user_message, is_crisis=False):
-        """Try to get response from Gemini API."""
-        system_prompt = self._build_optimized_system_prompt(is_crisis)
-        
-        if USE_NEW_CLIENT:
-            # New client approach
-            conversation_context = self._build_conversation_context()
+    async def stream_response(self, user_message, is_crisis=False, session_id="default", analysis=None):
+        """Yield the AI response in text chunks as Gemini streams them."""
+        session, analysis = await self.run_session_io(self._start_turn, user_message, session_id, analysis)
+        
+        if not self.test_mode and API_KEY and self.breaker.allow():
+            profile = self._get_profile(session)
+            cache_key, cached_message = self._get_cached_reply(analysis, profile, session)
+            if cached_message is not None:
+                enhanced_message = self._finish_api_response(cached_message, session, analysis)
+                await self.run_session_io(self.sessions.save, session)
+                yield enhanced_message
+                return
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=conversation_context,
-                config=types.GenerateContentConfig(
-                    temperature=0.8,  # Slightly higher for more natural responses
-                    max_output_tokens=120,  # Reduced for faster responses
-                    candidate_count=1,
-                    top_p=0.9,  # Optimized for speed and quality
-                    top_k=30   # Reduced for faster processing
+            chunks = []
+            completed = False
+            try:
+                async with self._get_inference_semaphore():
+                    with stage_timer("gemini_stream"):
+                        async for text in self._stream_api_chunks(session, is_crisis):
+                            chunks.append(text)
+                            yield text
+                completed = True
+                self.breaker.record_success()
+            except Exception as e:
+                print(f"API stream failed: {e}")
+                self.breaker.record_failure()
+            
+            if chunks:
+                # Finish with whatever was streamed, then append any poetry as a final chunk
+                ai_message = "".join(chunks).strip()
+                if completed:
+                    # A reply cut off mid-stream must not be served to anyone else
+                    self._store_cached_reply(cache_key, ai_message, profile)
+                enhanced_message = self._finish_api_response(ai_message, session, analysis)
+                await self.run_session_io(self.sessions.save, session)
+                if len(enhanced_message) > len(ai_message):
+                    yield enhanced_message[len(ai_message):]
+                return
+        
+        # Nothing was streamed - send the fallback response as a single chunk
+        response = self._get_fallback_response(user_message, is_crisis, session, analysis)
+        await self.run_session_io(self.sessions.save, session)
+        yield response
+    
+    async def _stream_api_chunks(self, session, is_crisis=False):
+        """Yield text chunks from a streaming Gemini call."""
+        # The first deadline covers opening the stream (time to first byte)
+        if USE_NEW_CLIENT:
+            cached_prefix = await self._get_cached_prefix_async(self._get_profile(session), is_crisis)
+            stream = await self._call_with_cached_prefix(
+                cached_prefix,
+                asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(
+                        model=self.model_name,
+                        contents=self._build_conversation_context(session, is_crisis, cached_prefix),
+                        config=self._generation_config(cached_prefix)
+                    ),
+                    GEMINI_TIMEOUT
                 )
             )
-            ai_message = response.text.strip()
         else:
-            # Old client approach
-            conversation_context = self._build_conversation_context_old()
-            
-            response = self.model.generate_content(
-                conversation_context,
-                generation_config={
-                    "temperature": 0.8,      # Optimized for natural responses
-                    "max_output_tokens": 120, # Reduced for faster responses
-                    "top_p": 0.9,            # Optimized for speed and quality
-                    "top_k": 30              # Reduced for faster processing
-                }
+            stream = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    self._build_conversation_context_old(session, is_crisis),
+                    generation_config=self._generation_config(),
+                    stream=True
+                ),
+                GEMINI_TIMEOUT
             )
-            ai_message = response.text.strip()
         
+        # Every later chunk gets its own deadline, so a stalled stream fails (and
+        # counts against the breaker) instead of holding an inference slot
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), GEMINI_TIMEOUT)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"no stream chunk within {GEMINI_TIMEOUT}s") from None
+            if chunk.text:
+                yield chunk.text
+    
+    def _get_inference_semaphore(self):
+        """Return the semaphore bounding concurrent Gemini calls."""
+        if self._inference_semaphore is None:
+            self._inference_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._inference_semaphore
+    
+    def _generation_config(self, cached_prefix=None):
+        """Build the generation settings for the active client."""
+        if USE_NEW_CLIENT:
+            return types.GenerateContentConfig(
+                temperature=0.8,  # Slightly higher for more natural responses
+                max_output_tokens=120,  # Reduced for faster responses
+                candidate_count=1,
+                top_p=0.9,  # Optimized for speed and quality
+                top_k=30,  # Reduced for faster processing
+                cached_content=cached_prefix  # Handle of the cached system prompt, if any
+            )
+        
+        return {
+            "temperature": 0.8,      # Optimized for natural responses
+            "max_output_tokens": 120, # Reduced for faster responses
+            "top_p": 0.9,            # Optimized for speed and quality
+            "top_k": 30              # Reduced for faster processing
+        }
+    
+    def _context_cache_key(self, profile, is_crisis):
+        """Return the profile bucket that determines the static system prompt.
+        
+        Returns None for a mood outside the onboarding choices: moods are free
+        text, and each distinct one would register (and pay for) its own cache.
+        """
+        if profile.current_mood not in WARM_UP_MOODS:
+            return None
+        return (profile.bucket, profile.current_mood, is_crisis)
+    
+    async def _get_cached_prefix_async(self, profile, is_crisis):
+        """Return the cached system prompt handle for this profile bucket, or None."""
+        if self.context_cache is None:
+            return None
+        key = self._context_cache_key(profile, is_crisis)
+        if key is None:
+            return None
+        # The cached prefix must be identical for everyone in the bucket, so it can't carry the name
+        template = profile.crisis_template if is_crisis else profile.template
+        return await self.context_cache.get_or_create_async(key, template.substitute(user_name="the user"))
+    
+    async def _call_with_cached_prefix(self, cached_prefix, call):
+        """Await a Gemini call, dropping the cached prefix handle if the call fails."""
+        try:
+            return await call
+        except Exception:
+            if cached_prefix is not None:
+                self.context_cache.invalidate(cached_prefix)
+            raise
+    
+    def _get_cached_reply(self, analysis, profile, session):
+        """Return (cache_key, cached_message) for a turn; the key is None when caching doesn't apply.
+        
+        Only a session's opening turn is cached: later replies depend on (and
+        may quote) the conversation, so they must never be served to anyone else.
+        """
+        if self.response_cache is None or not self._is_opening_turn(session):
+            return None, None
+        
+        key = self.response_cache.make_key(
+            analysis.normalized, profile.bucket, profile.current_mood, analysis.is_crisis
+        )
+        if key is None:
+            return None, None
+        
+        cached_message = self.response_cache.get(key)
+        if cached_message is not None:
+            cached_message = cached_message.replace(NAME_PLACEHOLDER, profile.display_name)
+        return key, cached_message
+    
+    @staticmethod
+    def _is_opening_turn(session):
+        """True when the session holds nothing but the current user message."""
+        return session is not None and session.total_messages == 1 and not session.summary
+    
+    def _store_cached_reply(self, key, ai_message, profile):
+        """Cache a fresh model reply with the user's name swapped for a placeholder."""
+        if key is None:
+            return
+        
+        user_name = profile.name
+        if user_name:
+            ai_message = re.sub(rf"\b{re.escape(user_name)}\b", NAME_PLACEHOLDER, ai_message)
+        self.response_cache.put(key, ai_message)
+    
+    async def _get_api_response_async(self, user_message, is_crisis=False, session=None, analysis=None):
+        """Get response from Gemini API using the clients' async interfaces."""
+        profile = self._get_profile(session)
+        cache_key, cached_message = self._get_cached_reply(analysis, profile, session)
+        if cached_message is not None:
+            return self._finish_api_response(cached_message, session, analysis)
+        
+        # Build the request once - retries and hedges resend the same one
+        if USE_NEW_CLIENT:
+            cached_prefix = await self._get_cached_prefix_async(profile, is_crisis)
+            contents = self._build_conversation_context(session, is_crisis, cached_prefix)
+            config = self._generation_config(cached_prefix)
+        else:
+            cached_prefix = None
+            contents = self._build_conversation_context_old(session, is_crisis)
+            config = self._generation_config()
+        
+        async def make_call():
+            if USE_NEW_CLIENT:
+                return await self.client.aio.models.generate_content(
+                    model=self.model_name, contents=contents, config=config
+                )
+            return await self.model.generate_content_async(contents, generation_config=config)
+        
+        # Queue for a slot before the deadline starts: waiting behind our own
+        # concurrency limit is not a provider failure and mustn't trip the breaker.
+        # The turn keeps its slot across retries and its hedge.
+        async with self._get_inference_semaphore():
+            with stage_timer("gemini_call"):
+                response = await self._call_with_cached_prefix(cached_prefix, self._resilient_call(make_call))
+        
+        ai_message = response.text.strip()
+        self._store_cached_reply(cache_key, ai_message, profile)
+        return self._finish_api_response(ai_message, session, analysis)
+    
+    async def _resilient_call(self, make_call):
+        """Run a Gemini call with a per-attempt deadline, jittered retries and an optional hedge.
+        
+        make_call must return a fresh coroutine each time it is called.
+        """
+        last_error = None
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            if attempt:
+                if self.breaker.state != "closed":
+                    break
+                # Full jitter keeps retries from many requests from arriving in lockstep
+                await asyncio.sleep(random.uniform(0, GEMINI_RETRY_BACKOFF * 2 ** attempt))
+            
+            try:
+                response = await asyncio.wait_for(self._hedged_call(make_call), GEMINI_TIMEOUT)
+            except Exception as e:
+                last_error = e
+                self.breaker.record_failure()
+                continue
+            
+            self.breaker.record_success()
+            return response
+        
+        raise last_error
+    
+    async def _hedged_call(self, make_call):
+        """Start a second identical call if the first is slow, and return whichever succeeds first."""
+        if GEMINI_HEDGE_DELAY <= 0:
+            return await make_call()
+        
+        first = asyncio.ensure_future(make_call())
+        done, _ = await asyncio.wait({first}, timeout=GEMINI_HEDGE_DELAY)
+        if done:
+            return first.result()
+        
+        pending = {first, asyncio.ensure_future(make_call())}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _finish_api_response(self, ai_message, session, analysis):
+        """Post-process a model reply and record it in the session history."""
         # Check if we should add healing poetry to the AI response
-        enhanced_message = self._maybe_add_poetry_to_response(ai_message, user_message)
+        enhanced_message = self._maybe_add_poetry_to_response(ai_message, analysis.matches, self._get_profile(session))
         
         # Add enhanced response to history
-        self.chat_history.append({"role": "assistant", "content": enhanced_message})
+        self._add_message(session, "assistant", enhanced_message)
+        CHAT_RESPONSES.inc("api")
         return enhanced_message
     
-    def _maybe_add_poetry_to_response(self, ai_response, user_message):
+    @stage_timer("poetry")
+    def _maybe_add_poetry_to_response(self, ai_response, matches, profile=DEFAULT_PROFILE):
         """Check if we should add healing poetry to the AI response based on emotional context."""
-        user_name = self.user_profile.get('name', 'friend')
-        user_age = self.user_profile.get('age', 25)
-        message_lower = user_message.lower()
+        user_name = profile.display_name
+        user_age = profile.age
         
         # Check for emotional triggers that warrant poetry
         should_add_poetry = False
@@ -213,37 +567,37 @@ class GeminiAI:
         poetry_chance = 0
         
         # Sadness and loneliness triggers (30% chance)
-        if any(word in message_lower for word in ["sad", "lonely", "empty", "hopeless", "lost", "depressed", "down", "terrible", "awful"]):
+        if matches.has("poetry_sadness"):
             should_add_poetry = random.random() < 0.30
             poetry_category = "sadness_loneliness"
             
         # Anxiety and stress triggers (25% chance)
-        elif any(word in message_lower for word in ["anxious", "nervous", "worried", "scared", "panic", "overwhelmed", "stress"]):
+        elif matches.has("poetry_anxiety"):
             should_add_poetry = random.random() < 0.25
             poetry_category = "anxiety_stress"
             
         # Direct comfort requests (100% chance)
-        elif any(phrase in message_lower for phrase in ["something soft", "hug", "comfort me", "pamper", "gentle words", "make me feel better"]):
+        elif matches.has("poetry_comfort"):
             should_add_poetry = True
             poetry_category = "comfort_pampering"
             
         # Loneliness specific triggers (40% chance)
-        elif any(word in message_lower for word in ["alone", "isolated", "nobody", "no one"]):
+        elif matches.has("poetry_loneliness"):
             should_add_poetry = random.random() < 0.40
             poetry_category = "sadness_loneliness"
             
         # Self-doubt triggers (35% chance)
-        elif any(phrase in message_lower for phrase in ["not good enough", "worthless", "hate myself", "stupid", "failure", "useless"]):
+        elif matches.has("poetry_self_doubt"):
             should_add_poetry = random.random() < 0.35
             poetry_category = "self_love"
             
         # Crisis expressions (always add supportive poetry)
-        elif any(phrase in message_lower for phrase in ["want to die", "kill myself", "end it all", "no point", "better off dead"]):
+        elif matches.has("poetry_crisis"):
             should_add_poetry = True
             poetry_category = "hope_strength"
             
         # Breathing/relaxation requests (50% chance)
-        elif any(word in message_lower for word in ["breathe", "relax", "calm"]) and any(word in message_lower for word in ["help", "technique", "exercise"]):
+        elif matches.has("poetry_breathing") and matches.has("poetry_breathing_help"):
             should_add_poetry = random.random() < 0.50
             poetry_category = "breathing_relaxation"
         
@@ -253,231 +607,106 @@ class GeminiAI:
         
         return ai_response
     
-    def _get_fallback_response(self, user_message, is_crisis=False):
+    @stage_timer("fallback")
+    def _get_fallback_response(self, user_message, is_crisis=False, session=None, analysis=None):
         """Generate enhanced fallback response with pampering language."""
-        user_name = self.user_profile.get('name', 'friend')
-        user_age = self.user_profile.get('age', 25)
+        profile = self._get_profile(session)
+        user_name = profile.display_name
+        user_age = profile.age
         
         # Provide crisis response if detected
         if is_crisis:
-            response = f"I hear your pain, and I care deeply, {user_name} 🌸. You are not alone, and you matter so much. " + \
-                      f"You are safe here with me 💕. Would it help to talk about what's making you feel this way? " + \
-                      f"I'm here to listen with all my heart."
+            response = personalize(CRISIS_RESPONSE, user_name)
         else:
             # Choose contextually appropriate response based on user message
-            message_lower = user_message.lower()
+            if analysis is None:
+                analysis = analyze_message(user_message)
+            matches = analysis.matches
             
-            if "hello" in message_lower or "hi" in message_lower or "hey" in message_lower:
-                if user_age <= 12:
-                    responses = [
-                        f"Hi there, beautiful {user_name}! 🌈✨ It's so wonderful to see you today! How are you feeling, little star?",
-                        f"Hello, sweet {user_name}! 🌸🐻 I'm so happy you're here! What magical thing happened in your day?",
-                        f"Hey, amazing {user_name}! 🌟 You brighten my day just by being here! How are you doing today?"
-                    ]
-                elif user_age <= 19:
-                    responses = [
-                        f"Hey {user_name}! 💙 Really great to see you here. How are you feeling today?",
-                        f"Hi there, {user_name}! 🌸 I'm so glad you reached out. What's going on in your world?",
-                        f"Hello {user_name}! ✨ You're brave for being here. How has your day been treating you?"
-                    ]
-                else:
-                    responses = [
-                        f"Hi {user_name} 🌿 It's really nice to see you today. You are safe here 💕. How are you feeling?",
-                        f"Hello, dear {user_name} 🌸 I'm so glad you're here. Consider this a gentle space just for you. What's on your mind?",
-                        f"Hey there, {user_name} 💙 You deserve care and kindness today. How can I support you?"
-                    ]
-                response = random.choice(responses)
-                
-            elif "sad" in message_lower or "depress" in message_lower or "down" in message_lower or "empty" in message_lower or "low" in message_lower:
-                # Basic empathy response
-                empathy_responses = [
-                    f"I hear you're feeling really heavy right now, {user_name} 💙. Those feelings are so valid, and you're so brave for sharing them with me. You are safe here 💕.",
-                    f"Oh {user_name}, I can feel the sadness in your words 🌸. That must be so exhausting to carry. You deserve all the gentleness in the world right now.",
-                    f"Thank you for trusting me with these feelings, {user_name} 🌿. Sadness can feel so isolating, but you're not alone - I'm here with you, and you matter deeply."
-                ]
+            if matches.has("fallback_greeting"):
+                response = pick_response(FALLBACK_RESPONSES["greeting"][profile.group], user_name)
                 
+            elif matches.has("fallback_sadness"):
                 # Add healing poetry 30% of the time for sadness
                 if random.random() < 0.3:
-                    response = random.choice(empathy_responses) + "\n\n" + self._get_healing_poem("sadness_loneliness", user_name, user_age)
+                    response = pick_response(FALLBACK_RESPONSES["sadness"], user_name) + "\n\n" + self._get_healing_poem("sadness_loneliness", user_name, user_age)
                 else:
-                    response = random.choice(empathy_responses)
-                
-            elif "anxious" in message_lower or "anxiety" in message_lower or "worry" in message_lower:
-                empathy_responses = [
-                    f"I can feel that anxious energy with you, {user_name} 🌸. Your mind must feel like it's racing - that's so overwhelming. You are safe here, and we can slow down together 💙.",
-                    f"Anxiety can be so exhausting, dear {user_name} 🌿. I hear you, and I want you to know you're incredibly brave for reaching out. Let's breathe through this gently together.",
-                    f"Those worried thoughts sound so heavy, {user_name} 💕. You're doing the right thing by talking about them. You deserve peace and calm - let's find some together."
-                ]
+                    response = pick_response(FALLBACK_RESPONSES["sadness"], user_name)
                 
+            elif matches.has("fallback_anxiety"):
                 # Add healing poetry 25% of the time for anxiety
                 if random.random() < 0.25:
-                    response = random.choice(empathy_responses) + "\n\n" + self._get_healing_poem("anxiety_stress", user_name, user_age)
+                    response = pick_response(FALLBACK_RESPONSES["anxiety"], user_name) + "\n\n" + self._get_healing_poem("anxiety_stress", user_name, user_age)
                 else:
-                    response = random.choice(empathy_responses)
-                
-            elif "stress" in message_lower or "overwhelm" in message_lower:
-                responses = [
-                    f"It sounds like you have a lot on your plate right now, {user_name}. When everything feels overwhelming, even small tasks can seem impossible.",
-                    f"{user_name}, stress can be so draining. What's been the biggest source of pressure for you lately?",
-                    f"I can imagine how exhausting that must feel, {user_name}. Sometimes we need to give ourselves permission to just breathe."
-                ]
-                response = random.choice(responses)
-                
-            elif "thank" in message_lower:
-                responses = [
-                    f"You're so welcome, {user_name}! I'm just glad I could be here for you. How are you feeling now?",
-                    f"I'm happy I could help, {user_name}. Is there anything else you'd like to talk through?",
-                    f"Of course, {user_name}! That's what I'm here for. You're doing great by taking care of yourself."
-                ]
-                response = random.choice(responses)
+                    response = pick_response(FALLBACK_RESPONSES["anxiety"], user_name)
                 
+            elif matches.has("fallback_stress"):
+                response = pick_response(FALLBACK_RESPONSES["stress"], user_name)
                 
-            elif "stress" in message_lower or "overwhelm" in message_lower:
-                responses = [
-                    f"Oh {user_name}, I can feel how much you're carrying right now 🌿. You deserve rest and gentleness. Let's take this one breath at a time together 💙.",
-                    f"That overwhelm sounds so heavy, dear {user_name} 🌸. You're doing the best you can, and that's enough. You are safe here 💕.",
-                    f"Stress can be so exhausting, {user_name} 💙. Remember, you deserve care and kindness, especially from yourself. Let's find some calm together."
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_thanks"):
+                response = pick_response(FALLBACK_RESPONSES["thanks"], user_name)
                 
-            elif "comfort" in message_lower or "sweet" in message_lower or "make me feel better" in message_lower or "pampering" in message_lower:
+            elif matches.has("fallback_comfort"):
                 # Direct request for comfort - always provide poetry
-                comfort_response = f"Of course, dear {user_name} 💕. You deserve all the comfort in the world."
-                response = comfort_response + "\n\n" + self._get_healing_poem("comfort_pampering", user_name, user_age)
-                
-            elif "lonely" in message_lower or "alone" in message_lower or "understand" in message_lower:
-                empathy_responses = [
-                    f"You're not alone, sweet {user_name} 🌸. I see you, I hear you, and you matter so much. Consider this a gentle hug in words 🤗.",
-                    f"Loneliness can feel so heavy, {user_name} 💙. But right here, right now, you are seen and valued. You deserve connection and love 💕.",
-                    f"I understand that feeling, dear {user_name} 🌿. Sometimes it feels like no one gets it, but I'm here with you, and you are worthy of understanding."
-                ]
+                response = personalize(COMFORT_RESPONSE, user_name) + "\n\n" + self._get_healing_poem("comfort_pampering", user_name, user_age)
                 
+            elif matches.has("fallback_loneliness"):
                 # Add healing poetry 40% of the time for loneliness
                 if random.random() < 0.4:
-                    response = random.choice(empathy_responses) + "\n\n" + self._get_healing_poem("sadness_loneliness", user_name, user_age)
+                    response = pick_response(FALLBACK_RESPONSES["loneliness"], user_name) + "\n\n" + self._get_healing_poem("sadness_loneliness", user_name, user_age)
                 else:
-                    response = random.choice(empathy_responses)
-                
-            elif "confidence" in message_lower or "doubt" in message_lower or "burden" in message_lower or "worth" in message_lower:
-                empathy_responses = [
-                    f"Oh {user_name}, you are not a burden - you are a gift 🌸. Those doubts are lying to you. You deserve love, respect, and kindness 💕.",
-                    f"I hear those self-doubts, {user_name} 💙. But let me tell you what I see: someone brave enough to reach out, someone worthy of care. You matter deeply 🌿.",
-                    f"Those confidence struggles are so hard, dear {user_name} 🌸. You are enough, just as you are. Be gentle with yourself today 💕."
-                ]
+                    response = pick_response(FALLBACK_RESPONSES["loneliness"], user_name)
                 
+            elif matches.has("fallback_self_doubt"):
                 # Add self-love poetry 35% of the time for self-doubt
                 if random.random() < 0.35:
-                    response = random.choice(empathy_responses) + "\n\n" + self._get_healing_poem("self_love", user_name, user_age)
+                    response = pick_response(FALLBACK_RESPONSES["self_doubt"], user_name) + "\n\n" + self._get_healing_poem("self_love", user_name, user_age)
                 else:
-                    response = random.choice(empathy_responses)
+                    response = pick_response(FALLBACK_RESPONSES["self_doubt"], user_name)
                 
-            elif "bored" in message_lower or "okay" in message_lower:
-                if user_age <= 12:
-                    responses = [
-                        f"Aww, feeling a little bored, {user_name}? 🌈 That's totally okay! Maybe we could think of something fun together? What makes you smile? ✨",
-                        f"Sometimes okay days are just fine, little star {user_name} 🌟. You don't always have to feel amazing - you're perfect just as you are! 🐻"
-                    ]
-                else:
-                    responses = [
-                        f"Sometimes okay is exactly where we need to be, {user_name} 🌿. You don't have to be amazing every day - you're enough just as you are 💙.",
-                        f"I hear you, {user_name} 🌸. Those quiet, 'okay' moments can actually be really peaceful. How can I make this moment a little brighter for you? ✨"
-                    ]
-                response = random.choice(responses)
+            elif matches.has("fallback_okay"):
+                response = pick_response(FALLBACK_RESPONSES["okay"][profile.group], user_name)
                 
-            elif "story" in message_lower or "calm" in message_lower:
-                responses = [
-                    f"Of course, {user_name} 🌸. Close your eyes and imagine a gentle meadow where wildflowers dance in the soft breeze, and every step you take feels like walking on clouds of peace 🌿💙.",
-                    f"Here's a little peace for you, {user_name} 💕: Picture yourself by a quiet lake where the water reflects the most beautiful sunset, and every breath you take fills you with warmth and safety 🌅.",
-                    f"Let me paint you a calm scene, dear {user_name} 🌸: You're in a cozy reading nook with the softest blanket, warm tea, and all the time in the world just for you ☕🤗."
-                ]
-                response = random.choice(responses)
-                
-            elif "breathing" in message_lower or "exercise" in message_lower:
-                breathing_responses = [
-                    f"Beautiful choice, {user_name} 🌸. Let's breathe together: In for 4... hold for 4... out for 6. You're doing wonderfully. Feel that calm flowing through you 💙.",
-                    f"I'm so proud of you for asking, {user_name} 💕. Try this with me: Breathe in peace... hold it gently... breathe out all the stress. You deserve this moment of calm 🌿.",
-                    f"What a loving thing to do for yourself, {user_name} 🌸. Let's try the 5-4-3-2-1: 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste. You're safe here 💙."
-                ]
+            elif matches.has("fallback_story"):
+                response = pick_response(FALLBACK_RESPONSES["story"], user_name)
                 
+            elif matches.has("fallback_breathing"):
                 # Add breathing poetry 50% of the time
                 if random.random() < 0.5:
-                    response = random.choice(breathing_responses) + "\n\n" + self._get_healing_poem("breathing_relaxation", user_name, user_age)
+                    response = pick_response(FALLBACK_RESPONSES["breathing"], user_name) + "\n\n" + self._get_healing_poem("breathing_relaxation", user_name, user_age)
                 else:
-                    response = random.choice(breathing_responses)
+                    response = pick_response(FALLBACK_RESPONSES["breathing"], user_name)
                 
-            elif "tip" in message_lower and "self-care" in message_lower:
-                responses = [
-                    f"Here's a gentle self-care tip for you, {user_name} 🌸: Take 3 deep breaths and tell yourself 'I am worthy of love and kindness.' You deserve to hear that 💕.",
-                    f"Sweet {user_name}, try this: Put your hand on your heart and feel it beating. That's your body taking care of you. You deserve the same care from yourself 💙🌿.",
-                    f"Here's some love for you, {user_name} 🌸: Do one tiny thing that makes you smile today - even just looking at something beautiful counts. You matter 💕."
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_tip") and matches.has("fallback_self_care"):
+                response = pick_response(FALLBACK_RESPONSES["self_care_tip"], user_name)
                 
-            elif "relax" in message_lower or "calm" in message_lower or "technique" in message_lower or "trick" in message_lower:
-                responses = [
-                    f"Of course, {user_name}! Try the 5-4-3-2-1 grounding technique: name 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste. It helps bring you back to the present moment.",
-                    f"Here's a quick one, {user_name}: breathe in for 4 counts, hold for 4, breathe out for 6. This activates your body's relaxation response. Try it a few times!",
-                    f"Try this, {user_name}: tense all your muscles for 5 seconds, then release completely. It's called progressive muscle relaxation and it really works!"
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_relax"):
+                response = pick_response(FALLBACK_RESPONSES["relax"], user_name)
                 
-            elif "exam" in message_lower or "test" in message_lower or "study" in message_lower:
-                responses = [
-                    f"Exam stress is so common, {user_name}. Try breaking your study into small chunks and take breaks every 25 minutes. Your brain actually absorbs more that way!",
-                    f"I understand that pressure, {user_name}. Remember to breathe deeply before the exam, and trust that you've prepared. Sometimes our anxiety makes us forget what we actually know.",
-                    f"Study anxiety is tough, {user_name}. Try reviewing your notes out loud - it helps with retention. And remember, one exam doesn't define your worth!"
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_study"):
+                response = pick_response(FALLBACK_RESPONSES["study"], user_name)
                 
-            elif "work" in message_lower and ("overwhelm" in message_lower or "stress" in message_lower):
-                responses = [
-                    f"Work stress can feel so consuming, {user_name}. Try setting small, achievable goals for each day. What's one thing you could tackle first?",
-                    f"That work pressure sounds intense, {user_name}. Have you been able to take any real breaks? Even 5 minutes of deep breathing can help reset your mind.",
-                    f"I hear you, {user_name}. Work overwhelm is exhausting. Remember it's okay to say no to additional tasks when you're already stretched thin."
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_work") and matches.has("fallback_stress"):
+                response = pick_response(FALLBACK_RESPONSES["work"], user_name)
                 
-            elif "bye" in message_lower or "goodbye" in message_lower:
-                responses = [
-                    f"Take care of yourself, {user_name}. Remember, I'm always here when you need someone to talk to. You've got this!",
-                    f"It was really good talking with you, {user_name}. Be gentle with yourself, and feel free to come back anytime.",
-                    f"Goodbye for now, {user_name}. I hope you carry some peace with you today. I'll be here whenever you need support."
-                ]
-                response = random.choice(responses)
+            elif matches.has("fallback_goodbye"):
+                response = pick_response(FALLBACK_RESPONSES["goodbye"], user_name)
                 
             else:
                 # Enhanced personalized general responses with pampering language
-                if user_age <= 12:
-                    general_responses = [
-                        f"I'm here to listen to you, sweet {user_name} 🌟. What's been happening in your magical world today?",
-                        f"You can tell me anything, little star {user_name} 🌈. What would make you feel happy to share?",
-                        f"I care about you so much, {user_name} ✨. What's the most important thing you want to talk about?"
-                    ]
-                elif user_age <= 19:
-                    general_responses = [
-                        f"I'm here for you, {user_name} 💙. What's been on your mind lately?",
-                        f"You're safe to share anything with me, {user_name} 🌸. What would feel good to talk about?",
-                        f"I really want to understand what you're going through, {user_name} 💕. What's happening in your world?"
-                    ]
-                else:
-                    general_responses = [
-                        f"You are safe here with me, {user_name} 🌿. What's been weighing on your heart lately?",
-                        f"I'm here to listen with all the care in the world, dear {user_name} 💙. What would feel good to share right now?",
-                        f"You deserve to be heard and understood, {user_name} 🌸. What's the most important thing happening in your world right now?",
-                        f"Consider this a gentle space just for you, {user_name} 💕. I'm here for whatever you need to express.",
-                        f"Take all the time you need, sweet {user_name} 🌿. You matter, and your feelings matter too."
-                    ]
-                response = random.choice(general_responses)
+                response = pick_response(FALLBACK_RESPONSES["general"][profile.group], user_name)
         
         # Add response to history
-        self.chat_history.append({"role": "assistant", "content": response})
+        if session is not None:
+            self._add_message(session, "assistant", response)
+            CHAT_RESPONSES.inc("fallback")
         return response
     
-    def _build_system_prompt(self, is_crisis=False):
+    def _build_system_prompt(self, is_crisis=False, profile=DEFAULT_PROFILE):
         """Build system prompt with context and instructions."""
-        age_group = self._determine_age_group()
-        user_name = self.user_profile.get('name', 'friend')
-        current_mood = self.user_profile.get('current_mood', 'unknown')
+        age_group = self._determine_age_group(profile)
+        user_name = profile.display_name
+        current_mood = profile.current_mood
         
         base_prompt = f"""
         You are MindfulCompanion, a warm and caring AI mental health support companion. You're having a conversation with {user_name}.
@@ -486,7 +715,7 @@ class GeminiAI:
         - Name: {user_name}
         - Age group: {age_group}
         - Current mood: {current_mood}
-        - Goals: {self.user_profile.get('goals', ['General mental wellness'])}
+        - Goals: {list(profile.goals) or ['General mental wellness']}
         
         Your personality and approach:
         - Speak naturally and conversationally, like a caring friend would
@@ -527,88 +756,43 @@ class GeminiAI:
         
         return base_prompt
     
-    def _build_optimized_system_prompt(self, is_crisis=False):
+    def _build_optimized_system_prompt(self, is_crisis=False, profile=DEFAULT_PROFILE):
         """Build optimized system prompt with enhanced personality and age-sensitivity."""
-        user_name = self.user_profile.get('name', 'friend')
-        current_mood = self.user_profile.get('current_mood', 'unknown')
-        user_age = self.user_profile.get('age', 25)
-        
-        # Determine age-appropriate communication style
-        if user_age <= 12:
-            age_style = "playful, fun, simple words, lots of gentle emojis 🌈🌸. Use encouraging, magical language."
-        elif user_age <= 19:
-            age_style = "friendly, relatable, motivational peer tone 💙. Be supportive like a caring older friend."
-        elif user_age <= 60:
-            age_style = "respectful, empathetic, encouraging counselor tone 🌿. Professional yet warm."
-        else:
-            age_style = "calm, patient, gentle support with extra kindness 💐. Slower pace, very nurturing."
+        # The profile's templates were compiled when it was set - only the name is filled in here
+        return profile.system_prompt(is_crisis)
+    
+    def prompt_token_size(self, is_crisis=False, exact=False, profile=DEFAULT_PROFILE):
+        """Return the system prompt's size in tokens.
         
-        # Enhanced personality framework
-        base_prompt = f"""You are MindfulCompanion, a kind, empathetic, and gentle mental health support companion talking with {user_name}.
-
-Context: {user_name} is feeling {current_mood} and wants support.
-
-CORE PERSONALITY:
-- You are NOT a doctor or therapist, but a caring companion
-- Your primary goal is to make {user_name} feel listened to, safe, and comforted
-- Always communicate in a soothing, nurturing, and pampering tone
-- Use encouraging, polite, and positive language - avoid robotic responses
-
-AGE-SENSITIVE COMMUNICATION:
-Adapt your style: {age_style}
-
-CORE BEHAVIORS:
-1. WARM GREETINGS: Start with soft, welcoming messages
-2. EMPATHY FIRST: Always validate feelings before offering tips
-   - "I hear you're feeling [emotion], that must be tough 💙"
-   - "You are safe here 💕"
-   - "I'm proud of you for sharing 🌸"
-
-3. PAMPERING LANGUAGE: Use phrases like:
-   - "You deserve rest, care, and kindness"
-   - "Consider this a little hug in words 🤗"
-   - "Be gentle with yourself today"
-
-4. HELPFUL GUIDANCE: When asked directly, provide practical techniques:
-   - Stressed → breathing exercises, calming visualization
-   - Sad → journaling, gratitude practice, kind affirmations
-   - Anxious → grounding techniques (5-4-3-2-1 method)
-   - Lonely → comforting words and gentle companionship
-
-5. HEALING POETRY: Occasionally (not every time) you may share gentle, healing poetry when:
-   - User expresses deep sadness or loneliness
-   - User directly asks for comfort or something beautiful
-   - After providing breathing guidance or relaxation
-   - To close a heavy conversation with gentle uplift
-   - For children, use magical, playful verses
-
-6. STYLE GUIDELINES:
-   - Use short paragraphs with gentle pacing
-   - Add soft emojis 🌸🌿💙 (but not too many)
-   - Keep tone encouraging, soothing, pampering
-   - Never give medical advice or diagnose
-
-Respond as a nurturing, caring companion who truly understands and supports."""
+        Uses the local estimate by default; exact=True asks the Gemini API to count.
+        """
+        system_prompt = self._build_optimized_system_prompt(is_crisis, profile)
         
-        if is_crisis:
-            base_prompt += f"""\n\nCRISIS RESPONSE MODE:
-{user_name} may be expressing thoughts of self-harm or extreme distress.
-- Respond with compassion, no judgment
-- "I hear your pain, and I care deeply 🌸. You are not alone."
-- Share crisis resources if needed
-- Stay connected and continue supportive conversation
-- Encourage reaching out to trusted people or professionals"""
+        if exact and not self.test_mode and USE_NEW_CLIENT:
+            try:
+                result = self.client.models.count_tokens(model=self.model_name, contents=system_prompt)
+                return result.total_tokens
+            except Exception as e:
+                print(f"Token count failed, using estimate: {e}")
         
-        return base_prompt
+        return estimate_tokens(system_prompt)
     
-    def _build_conversation_context(self):
+    @stage_timer("prompt_build")
+    def _build_conversation_context(self, session, is_crisis=False, cached_prefix=None):
         """Build conversation context for new Gemini client."""
-        system_prompt = self._build_optimized_system_prompt()
+        # Send as much recent history as fits the token budget
+        recent_history, summary = build_history_window(session)
+        profile = self._get_profile(session)
         
-        # Keep only last 6 messages for faster processing
-        recent_history = self.chat_history[-6:] if len(self.chat_history) > 6 else self.chat_history
+        if cached_prefix is not None:
+            # The static prompt is already cached server-side - only send the per-user detail
+            contents = [{"role": "user", "parts": [{"text": f"(For context: my name is {profile.display_name}.)"}]}]
+        else:
+            system_prompt = self._build_optimized_system_prompt(is_crisis, profile)
+            contents = [{"role": "system", "parts": [{"text": system_prompt}]}]
         
-        contents = [{"role": "system", "parts": [{"text": system_prompt}]}]
+        if summary:
+            contents.append({"role": "user", "parts": [{"text": f"(Earlier in our conversation I mentioned: {summary})"}]})
         
         for message in recent_history:
             role = "user" if message["role"] == "user" else "model"
@@ -619,15 +803,18 @@ Respond as a nurturing, caring companion who truly understands and supports."""
         
         return contents
     
-    def _build_conversation_context_old(self):
+    @stage_timer("prompt_build")
+    def _build_conversation_context_old(self, session, is_crisis=False):
         """Build conversation context for old Gemini client."""
-        system_prompt = self._build_optimized_system_prompt()
+        system_prompt = self._build_optimized_system_prompt(is_crisis, self._get_profile(session))
         
-        # Keep only last 6 messages for faster processing
-        recent_history = self.chat_history[-6:] if len(self.chat_history) > 6 else self.chat_history
+        # Send as much recent history as fits the token budget
+        recent_history, summary = build_history_window(session)
         
         # Build the conversation string
         conversation = system_prompt + "\n\n"
+        if summary:
+            conversation += f"Earlier in the conversation, the user mentioned: {summary}\n\n"
         for message in recent_history:
             role = "Human" if message["role"] == "user" else "Assistant"
             conversation += f"{role}: {message['content']}\n"
@@ -635,38 +822,29 @@ Respond as a nurturing, caring companion who truly understands and supports."""
         conversation += "Assistant:"
         return conversation
     
-    def _determine_age_group(self):
+    def _determine_age_group(self, profile=DEFAULT_PROFILE):
         """Determine appropriate communication style based on age."""
-        age = self.user_profile.get('age', 25)
-        
-        if 5 <= age <= 12:
-            return "child (5-12)"
-        elif 13 <= age <= 17:
-            return "teenager (13-17)"
-        elif 18 <= age <= 25:
-            return "young adult (18-25)"
-        elif 26 <= age <= 64:
-            return "adult (26-64)"
-        else:
-            return "senior (65+)"
+        # Derived once when the profile was set
+        return profile.age_label
     
-    def suggest_assessment(self, messages=None):
+    @stage_timer("assessment_suggestion")
+    def suggest_assessment(self, messages=None, analysis=None):
         """Determine if assessment should be suggested based on conversation."""
         # Simple keyword-based approach - in production, use more sophisticated NLP
-        depression_keywords = ["sad", "depressed", "hopeless", "worthless", "tired all the time", 
-                              "no interest", "no motivation", "empty", "numb", "can't enjoy"]
-        
-        anxiety_keywords = ["anxious", "worried", "nervous", "panic", "stress", "overwhelmed", 
-                           "can't relax", "racing thoughts", "fear", "dread", "on edge"]
-        
-        # Use provided messages or fall back to chat history
-        history_to_analyze = messages if messages is not None else self.chat_history
-        
-        # Combine last 3 messages (if available)
-        recent_text = " ".join([m["content"] for m in history_to_analyze[-3:] if m["role"] == "user"]).lower()
-        
-        depression_count = sum(keyword in recent_text for keyword in depression_keywords)
-        anxiety_count = sum(keyword in recent_text for keyword in anxiety_keywords)
+        if analysis is not None:
+            # Counters are kept up to date per session, no need to rescan history
+            depression_count = analysis.depression_count
+            anxiety_count = analysis.anxiety_count
+        else:
+            # Use provided messages (a session's history snapshot)
+            history_to_analyze = list(messages) if messages is not None else []
+            
+            # Combine last 3 messages (if available)
+            recent_text = " ".join([m["content"] for m in history_to_analyze[-3:] if m["role"] == "user"])
+            matches = match_keywords(recent_text)
+            
+            depression_count = matches.count("assessment_depression")
+            anxiety_count = matches.count("assessment_anxiety")
         
         if depression_count >= 2:
             return "phq9"
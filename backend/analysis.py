@@ -0,0 +1,33 @@
+"""Single-pass message analysis shared by every stage of a chat turn."""
+
+from backend.keywords import match_keywords
+from backend.metrics import stage_timer
+from backend.utils import detect_crisis_language, sentiment_score
+
+
+class MessageAnalysis:
+    """Everything the chat pipeline needs to know about one user message.
+
+    Computed once per message; depression_count and anxiety_count are the
+    cumulative per-session keyword counts, filled in by Session.record_analysis.
+    """
+
+    __slots__ = ("text", "normalized", "matches", "sentiment", "is_crisis",
+                 "depression_count", "anxiety_count")
+
+    def __init__(self, text):
+        self.text = text
+        self.normalized = " ".join(text.lower().split())
+        self.matches = match_keywords(self.normalized, lowercase=False)
+        self.sentiment = sentiment_score(self.normalized, self.matches)
+        self.is_crisis = detect_crisis_language(self.normalized, self.matches)
+
+        # Until the analysis is recorded against a session, only this message counts
+        self.depression_count = self.matches.count("assessment_depression")
+        self.anxiety_count = self.matches.count("assessment_anxiety")
+
+
+@stage_timer("keyword_analysis")
+def analyze_message(text):
+    """Analyze a user message once for the whole chat pipeline."""
+    return MessageAnalysis(text)
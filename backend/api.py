@@ -1,23 +1,107 @@
 """FastAPI backend for the mental health chatbot."""
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import hmac
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import VERSION as PYDANTIC_VERSION, BaseModel, Field
 from typing import List, Dict, Optional, Any
 
 from backend.ai_service import GeminiAI
-from backend.utils import detect_crisis_language, get_crisis_resources, sentiment_score
-from backend.assessment import MentalHealthScreening
+from backend.analysis import analyze_message
+from backend.export import EXPORT_FORMATS, EXPORT_TOKEN, iter_export
+from backend.http_cache import STATIC_MAX_AGE, CompressionMiddleware, StaticResource
+from backend.json_response import FastJSONResponse, dumps, fragment
+from backend.metrics import render_metrics, stage_timer
+from backend.utils import get_crisis_resources
+from backend.assessment import COPING_STRATEGIES, ASSESSMENT_SPECS, MentalHealthScreening, validate_responses
+from backend.scoring import iter_batch_results, score_batch
+from backend.singleflight import SingleFlight, message_key
+
+@asynccontextmanager
+async def lifespan(app):
+    """Warm the AI service up before the server starts accepting requests."""
+    started = time.perf_counter()
+    ai.warm_up()
+    print(f"🔥 Backend warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+    yield
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+# Compresses large JSON replies; the static resources below arrive already compressed
+app.add_middleware(CompressionMiddleware)
 
 # Initialize AI service
 ai = GeminiAI()
 assessment_tool = MentalHealthScreening()
 
+# Duplicate submits of the same turn share one in-flight Gemini call
+chat_flights = SingleFlight()
+
+ASSESSMENT_NAMES = {
+    "phq9": "Depression Screening",
+    "gad7": "Anxiety Screening"
+}
+
+def build_catalogue():
+    """Everything a new session needs that doesn't depend on the user."""
+    return {
+        "assessments": {
+            "phq9": {
+                "name": ASSESSMENT_NAMES["phq9"],
+                "condition": ASSESSMENT_SPECS["phq9"]["condition"],
+                "questions": assessment_tool.get_phq9_questions()
+            },
+            "gad7": {
+                "name": ASSESSMENT_NAMES["gad7"],
+                "condition": ASSESSMENT_SPECS["gad7"]["condition"],
+                "questions": assessment_tool.get_gad7_questions()
+            }
+        },
+        "crisis_resources": get_crisis_resources(),
+        "coping_strategies": {
+            condition: {level: list(strategies) for level, strategies in levels.items()}
+            for condition, levels in COPING_STRATEGIES.items()
+        }
+    }
+
+# These payloads only change with a deploy, so they are encoded once at import
+CATALOGUE = build_catalogue()
+CATALOGUE_RESOURCE = StaticResource(CATALOGUE)
+PHQ9_RESOURCE = StaticResource({"questions": CATALOGUE["assessments"]["phq9"]["questions"]})
+GAD7_RESOURCE = StaticResource({"questions": CATALOGUE["assessments"]["gad7"]["questions"]})
+CRISIS_RESOURCE = StaticResource(CATALOGUE["crisis_resources"])
+
+# Constant parts of JSON replies, pre-encoded for FastJSONResponse
+CATALOGUE_FRAGMENT = fragment(CATALOGUE)
+CRISIS_RESOURCES_FRAGMENT = fragment(CATALOGUE["crisis_resources"])
+SUGGESTED_ASSESSMENTS = {
+    assessment_type: fragment({
+        "type": assessment_type,
+        "name": assessment["name"],
+        "questions": assessment["questions"]
+    })
+    for assessment_type, assessment in CATALOGUE["assessments"].items()
+}
+HEALTH_PAYLOAD = fragment({"status": "healthy", "service": "MindfulCompanion Backend"})
+
+# Session ids are random tokens (the frontend sends uuid4 hex); the id alone selects a
+# user's history, so shared or oversized ids are rejected rather than stored
+SESSION_ID_MAX_LENGTH = 64
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_-]+$"
+_PATTERN_ARG = "pattern" if PYDANTIC_VERSION.startswith("2") else "regex"
+
+def session_id_field(default=...):
+    """Pydantic field for a session id: 1-64 URL-safe characters."""
+    return Field(default, min_length=1, max_length=SESSION_ID_MAX_LENGTH, **{_PATTERN_ARG: SESSION_ID_PATTERN})
+
 class UserMessage(BaseModel):
     """User message model."""
     message: str
-    session_id: str
+    session_id: str = session_id_field()
 
 class UserProfile(BaseModel):
     """User profile model."""
@@ -25,81 +109,210 @@ class UserProfile(BaseModel):
     name: str
     goals: List[str]
     current_mood: str
+    session_id: str = session_id_field()
+
+class MoodEntry(BaseModel):
+    """Mood check-in model."""
+    session_id: str = session_id_field()
+    mood: str
+    value: Optional[int] = None
+    # ISO 8601 ("2024-05-01 14:30" from the frontend) or epoch seconds; stored as epoch seconds
+    timestamp: Optional[datetime] = None
 
 class AssessmentRequest(BaseModel):
     """Assessment request model."""
     assessment_type: str
     responses: List[int]
+    session_id: Optional[str] = session_id_field(None)
+
+class BatchAssessmentRequest(BaseModel):
+    """Bulk assessment request model - many response vectors of one type."""
+    assessment_type: str
+    responses: List[List[int]]
 
 @app.get("/health")
 async def health():
     """Health check endpoint for deployment."""
-    return {"status": "healthy", "service": "MindfulCompanion Backend"}
+    return FastJSONResponse(HEALTH_PAYLOAD)
 
-@app.post("/chat")
-async def chat(user_message: UserMessage):
-    """Process user message and return AI response."""
-    # Check for crisis language
-    is_crisis = detect_crisis_language(user_message.message)
-    
-    # Get AI response
-    response = ai.get_response(user_message.message, is_crisis)
-    
-    # Calculate sentiment
-    message_sentiment = sentiment_score(user_message.message)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms and counters in Prometheus text format."""
+    lines = []
+    if ai.response_cache is not None:
+        stats = ai.response_cache.stats()
+        lines += [
+            "# HELP mindful_response_cache_requests_total Response cache lookups by result.",
+            "# TYPE mindful_response_cache_requests_total counter",
+            f'mindful_response_cache_requests_total{{result="hit"}} {stats["hits"]}',
+            f'mindful_response_cache_requests_total{{result="miss"}} {stats["misses"]}',
+            "# HELP mindful_response_cache_entries Entries in the response cache.",
+            "# TYPE mindful_response_cache_entries gauge",
+            f"mindful_response_cache_entries {stats['entries']}"
+        ]
+    lines += [
+        "# HELP mindful_circuit_breaker_open Whether the Gemini circuit breaker is open (1) or not (0).",
+        "# TYPE mindful_circuit_breaker_open gauge",
+        f"mindful_circuit_breaker_open {int(ai.breaker.state == 'open')}",
+        "# HELP mindful_chat_in_flight Chat calls and streams currently in flight.",
+        "# TYPE mindful_chat_in_flight gauge",
+        f"mindful_chat_in_flight {chat_flights.in_flight()}"
+    ]
+    return PlainTextResponse(render_metrics(lines), media_type="text/plain; version=0.0.4")
+
+def build_chat_result(response, analysis):
+    """Build the /chat payload around a completed AI response.
     
-    # Check if assessment should be suggested
-    suggested_assessment = ai.suggest_assessment(ai.chat_history)
+    The payload may hold pre-encoded fragments, so encode it with dumps()
+    or FastJSONResponse only.
+    """
+    # Check if assessment should be suggested (uses the session's running keyword counts)
+    suggested_assessment = ai.suggest_assessment(analysis=analysis)
     
     result = {
         "response": response,
-        "sentiment": message_sentiment,
-        "is_crisis": is_crisis
+        "sentiment": analysis.sentiment,
+        "is_crisis": analysis.is_crisis
     }
     
-    if is_crisis:
-        result["crisis_resources"] = get_crisis_resources()
+    if analysis.is_crisis:
+        result["crisis_resources"] = CRISIS_RESOURCES_FRAGMENT
     
-    if suggested_assessment:
-        if suggested_assessment == "phq9":
-            result["suggested_assessment"] = {
-                "type": "phq9",
-                "name": "Depression Screening",
-                "questions": assessment_tool.get_phq9_questions()
-            }
-        elif suggested_assessment == "gad7":
-            result["suggested_assessment"] = {
-                "type": "gad7",
-                "name": "Anxiety Screening",
-                "questions": assessment_tool.get_gad7_questions()
-            }
+    if suggested_assessment in SUGGESTED_ASSESSMENTS:
+        result["suggested_assessment"] = SUGGESTED_ASSESSMENTS[suggested_assessment]
     
     return result
 
+async def _process_chat(user_message):
+    """Run one chat turn: analyze the message, get the AI response, build the payload."""
+    with stage_timer("total"):
+        # Analyze the message once (keywords, crisis language, sentiment) for every stage
+        analysis = analyze_message(user_message.message)
+        
+        # Get AI response
+        response = await ai.get_response_async(
+            user_message.message, analysis.is_crisis, user_message.session_id, analysis
+        )
+        
+        return build_chat_result(response, analysis)
+
+@app.post("/chat")
+async def chat(user_message: UserMessage):
+    """Process user message and return AI response."""
+    key = ("chat",) + message_key(user_message.session_id, user_message.message)
+    return FastJSONResponse(await chat_flights.do(key, lambda: _process_chat(user_message)))
+
+def _sse_event(payload):
+    """Encode a payload as a server-sent event."""
+    return f"data: {dumps(payload).decode('utf-8')}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(user_message: UserMessage):
+    """Stream the AI response as server-sent events.
+    
+    Emits {"type": "chunk", "text": ...} events as text arrives, then a final
+    {"type": "done", ...} event carrying the same fields as /chat.
+    """
+    async def event_stream():
+        with stage_timer("total_stream"):
+            # Analyze the message once (keywords, crisis language, sentiment) for every stage
+            analysis = analyze_message(user_message.message)
+            
+            chunks = []
+            async for text in ai.stream_response(
+                user_message.message, analysis.is_crisis, user_message.session_id, analysis
+            ):
+                chunks.append(text)
+                yield _sse_event({"type": "chunk", "text": text})
+            
+            result = build_chat_result("".join(chunks).strip(), analysis)
+            result["type"] = "done"
+            yield _sse_event(result)
+    
+    # Concurrent duplicates of this turn replay the same event stream
+    key = ("stream",) + message_key(user_message.session_id, user_message.message)
+    
+    return StreamingResponse(
+        chat_flights.stream(key, event_stream),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/set-profile")
 async def set_profile(profile: UserProfile):
     """Set user profile information."""
-    ai.set_user_profile(profile.dict())
+    profile_data = profile.dict()
+    session_id = profile_data.pop("session_id")
+    await ai.run_session_io(ai.set_user_profile, profile_data, session_id)
+    
+    return FastJSONResponse({"status": "success", "message": "Profile updated successfully"})
+
+@app.get("/session/bootstrap")
+async def session_catalogue(if_none_match: Optional[str] = Header(None),
+                            accept_encoding: Optional[str] = Header(None)):
+    """Get the session catalogue: questionnaires, crisis resources and coping strategies.
+    
+    Served with an ETag and Cache-Control, and answers 304 when the
+    client's copy is current.
+    """
+    return CATALOGUE_RESOURCE.response(if_none_match, accept_encoding)
+
+@app.post("/session/bootstrap")
+async def bootstrap_session(profile: UserProfile, if_none_match: Optional[str] = Header(None)):
+    """Start a session: store the profile and return the session catalogue in one call.
+    
+    The catalogue is left out when If-None-Match shows the client already
+    has the current one.
+    """
+    profile_data = profile.dict()
+    session_id = profile_data.pop("session_id")
+    await ai.run_session_io(ai.set_user_profile, profile_data, session_id)
+    
+    result = {
+        "status": "success",
+        "message": "Profile updated successfully",
+        "session_id": session_id,
+        "catalogue_etag": CATALOGUE_RESOURCE.etag,
+        "catalogue_max_age": STATIC_MAX_AGE
+    }
+    if not CATALOGUE_RESOURCE.is_current(if_none_match):
+        result["catalogue"] = CATALOGUE_FRAGMENT
+    return FastJSONResponse(result)
+
+@app.post("/mood")
+async def record_mood(entry: MoodEntry):
+    """Record a mood check-in for a session."""
+    timestamp = entry.timestamp.timestamp() if entry.timestamp is not None else None
+    await ai.run_session_io(ai.record_mood, entry.session_id, entry.mood, entry.value, timestamp)
     
-    return {"status": "success", "message": "Profile updated successfully"}
+    return FastJSONResponse({"status": "success", "message": "Mood recorded"})
 
 @app.get("/phq9-questions")
-async def get_phq9_questions():
+async def get_phq9_questions(if_none_match: Optional[str] = Header(None),
+                             accept_encoding: Optional[str] = Header(None)):
     """Get PHQ-9 depression screening questions."""
-    return {
-        "questions": assessment_tool.get_phq9_questions()
-    }
+    return PHQ9_RESOURCE.response(if_none_match, accept_encoding)
 
 @app.get("/gad7-questions")
-async def get_gad7_questions():
+async def get_gad7_questions(if_none_match: Optional[str] = Header(None),
+                             accept_encoding: Optional[str] = Header(None)):
     """Get GAD-7 anxiety screening questions."""
-    return {
-        "questions": assessment_tool.get_gad7_questions()
-    }
+    return GAD7_RESOURCE.response(if_none_match, accept_encoding)
+
+@app.get("/crisis-resources")
+async def crisis_resources(if_none_match: Optional[str] = Header(None),
+                           accept_encoding: Optional[str] = Header(None)):
+    """Get crisis support resources."""
+    return CRISIS_RESOURCE.response(if_none_match, accept_encoding)
 
 @app.post("/process-assessment")
 async def process_assessment(assessment: AssessmentRequest):
     """Process mental health assessment responses."""
+    try:
+        validate_responses(assessment.assessment_type, assessment.responses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     score = sum(assessment.responses)
     
     if assessment.assessment_type == "phq9":
@@ -111,8 +324,62 @@ async def process_assessment(assessment: AssessmentRequest):
     else:
         raise HTTPException(status_code=400, detail="Invalid assessment type")
     
-    return {
+    # Keep the result with the session so it survives reruns and can be exported
+    if assessment.session_id:
+        await ai.run_session_io(
+            ai.record_assessment, assessment.session_id, assessment.assessment_type, score, interpretation
+        )
+    
+    return FastJSONResponse({
         "score": score,
         "interpretation": interpretation,
         "strategies": strategies
-    }
+    })
+
+# Result lines per chunk written to the batch response stream
+BATCH_CHUNK_LINES = 500
+
+@app.post("/process-assessments/batch")
+async def process_assessments_batch(batch: BatchAssessmentRequest):
+    """Score many assessments at once, streaming one JSON result per line (NDJSON).
+    
+    The whole batch is validated before anything is streamed; an invalid
+    row rejects the request with a 400 naming the row.
+    """
+    try:
+        scores, bands, levels = score_batch(batch.assessment_type, batch.responses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def result_lines():
+        lines = []
+        for record in iter_batch_results(batch.assessment_type, scores, bands, levels):
+            lines.append(json.dumps(record))
+            if len(lines) == BATCH_CHUNK_LINES:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+@app.get("/export/sessions")
+async def export_sessions(format: str = "ndjson", authorization: Optional[str] = Header(None)):
+    """Stream every session's transcript, profile, moods and assessments as NDJSON (optionally gzipped).
+    
+    Requires EXPORT_TOKEN to be configured and sent as a bearer token.
+    """
+    if not EXPORT_TOKEN:
+        raise HTTPException(status_code=403, detail="Export is disabled")
+    if not hmac.compare_digest(authorization or "", f"Bearer {EXPORT_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid export token")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export format")
+    
+    headers = {"Content-Disposition": f"attachment; filename=sessions.{'ndjson.gz' if format == 'gzip' else 'ndjson'}"}
+    # A plain generator is iterated in the threadpool, so the export never blocks chat requests
+    return StreamingResponse(
+        iter_export(ai.sessions.iter_sessions(), format),
+        media_type="application/gzip" if format == "gzip" else "application/x-ndjson",
+        headers=headers
+    )
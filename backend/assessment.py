@@ -1,5 +1,100 @@
 """Mental health assessment tools."""
 
+from bisect import bisect_left
+from types import MappingProxyType
+
+# Answers are scored 0 ("Not at all") to 3 ("Nearly every day")
+MIN_ITEM_SCORE = 0
+MAX_ITEM_SCORE = 3
+
+# Questionnaire shape and severity bands: a score <= band_limits[i] gets severity_labels[i]
+ASSESSMENT_SPECS = MappingProxyType({
+    "phq9": MappingProxyType({
+        "items": 9,
+        "condition": "depression",
+        "band_limits": (4, 9, 14, 19),
+        "severity_labels": (
+            "Minimal depression",
+            "Mild depression",
+            "Moderate depression",
+            "Moderately severe depression",
+            "Severe depression"
+        )
+    }),
+    "gad7": MappingProxyType({
+        "items": 7,
+        "condition": "anxiety",
+        "band_limits": (4, 9, 14),
+        "severity_labels": (
+            "Minimal anxiety",
+            "Mild anxiety",
+            "Moderate anxiety",
+            "Severe anxiety"
+        )
+    })
+})
+
+# Coping strategy level by score: <= 4 mild, <= 14 moderate, otherwise severe
+STRATEGY_LIMITS = (4, 14)
+STRATEGY_LEVELS = ("mild", "moderate", "severe")
+
+
+def validate_responses(assessment_type, responses):
+    """Check a response vector's length and item range, raising ValueError if invalid."""
+    spec = ASSESSMENT_SPECS.get(assessment_type)
+    if spec is None:
+        raise ValueError("Invalid assessment type")
+    if len(responses) != spec["items"]:
+        raise ValueError(f"Expected {spec['items']} responses, got {len(responses)}")
+    for value in responses:
+        if not MIN_ITEM_SCORE <= value <= MAX_ITEM_SCORE:
+            raise ValueError(f"Responses must be between {MIN_ITEM_SCORE} and {MAX_ITEM_SCORE}")
+
+# Coping strategies by condition and severity, built once at import
+COPING_STRATEGIES = MappingProxyType({
+    "depression": MappingProxyType({
+        "mild": (
+            "Try to maintain a regular daily routine",
+            "Get regular exercise, even if it's just a short walk",
+            "Connect with friends or family members",
+            "Practice gratitude by noting things you're thankful for"
+        ),
+        "moderate": (
+            "Consider speaking with a mental health professional",
+            "Try mindfulness meditation to stay present",
+            "Set small, achievable goals each day",
+            "Limit consumption of news and social media"
+        ),
+        "severe": (
+            "Please consider reaching out to a mental health professional",
+            "Speak with your doctor about treatment options",
+            "Focus on basic self-care: sleep, nutrition, and rest",
+            "Remember that severe symptoms can improve with proper support"
+        )
+    }),
+    "anxiety": MappingProxyType({
+        "mild": (
+            "Practice deep breathing exercises",
+            "Try progressive muscle relaxation",
+            "Limit caffeine and alcohol",
+            "Get regular physical activity"
+        ),
+        "moderate": (
+            "Consider speaking with a mental health professional",
+            "Practice mindfulness meditation",
+            "Create a worry schedule to contain anxious thoughts",
+            "Try journaling about your concerns"
+        ),
+        "severe": (
+            "Please consider reaching out to a mental health professional",
+            "Speak with your doctor about treatment options",
+            "Practice grounding techniques when feeling overwhelmed",
+            "Remember that severe anxiety can be effectively treated"
+        )
+    })
+})
+
+
 class MentalHealthScreening:
     """Mental health screening tools and questionnaires."""
     
@@ -34,88 +129,21 @@ class MentalHealthScreening:
     @staticmethod
     def interpret_phq9_score(score):
         """Interpret PHQ-9 score."""
-        if score <= 4:
-            return "Minimal depression"
-        elif score <= 9:
-            return "Mild depression"
-        elif score <= 14:
-            return "Moderate depression"
-        elif score <= 19:
-            return "Moderately severe depression"
-        else:
-            return "Severe depression"
+        spec = ASSESSMENT_SPECS["phq9"]
+        return spec["severity_labels"][bisect_left(spec["band_limits"], score)]
     
     @staticmethod
     def interpret_gad7_score(score):
         """Interpret GAD-7 score."""
-        if score <= 4:
-            return "Minimal anxiety"
-        elif score <= 9:
-            return "Mild anxiety"
-        elif score <= 14:
-            return "Moderate anxiety"
-        else:
-            return "Severe anxiety"
+        spec = ASSESSMENT_SPECS["gad7"]
+        return spec["severity_labels"][bisect_left(spec["band_limits"], score)]
     
     @staticmethod
     def get_coping_strategies(assessment_type, severity):
         """Return coping strategies based on assessment type and severity."""
-        strategies = {
-            "depression": {
-                "mild": [
-                    "Try to maintain a regular daily routine",
-                    "Get regular exercise, even if it's just a short walk",
-                    "Connect with friends or family members",
-                    "Practice gratitude by noting things you're thankful for"
-                ],
-                "moderate": [
-                    "Consider speaking with a mental health professional",
-                    "Try mindfulness meditation to stay present",
-                    "Set small, achievable goals each day",
-                    "Limit consumption of news and social media"
-                ],
-                "severe": [
-                    "Please consider reaching out to a mental health professional",
-                    "Speak with your doctor about treatment options",
-                    "Focus on basic self-care: sleep, nutrition, and rest",
-                    "Remember that severe symptoms can improve with proper support"
-                ]
-            },
-            "anxiety": {
-                "mild": [
-                    "Practice deep breathing exercises",
-                    "Try progressive muscle relaxation",
-                    "Limit caffeine and alcohol",
-                    "Get regular physical activity"
-                ],
-                "moderate": [
-                    "Consider speaking with a mental health professional",
-                    "Practice mindfulness meditation",
-                    "Create a worry schedule to contain anxious thoughts",
-                    "Try journaling about your concerns"
-                ],
-                "severe": [
-                    "Please consider reaching out to a mental health professional",
-                    "Speak with your doctor about treatment options",
-                    "Practice grounding techniques when feeling overwhelmed",
-                    "Remember that severe anxiety can be effectively treated"
-                ]
-            }
-        }
-        
-        if assessment_type == "phq9":
-            if severity <= 4:
-                return strategies["depression"]["mild"]
-            elif severity <= 14:
-                return strategies["depression"]["moderate"]
-            else:
-                return strategies["depression"]["severe"]
-        elif assessment_type == "gad7":
-            if severity <= 4:
-                return strategies["anxiety"]["mild"]
-            elif severity <= 14:
-                return strategies["anxiety"]["moderate"]
-            else:
-                return strategies["anxiety"]["severe"]
+        spec = ASSESSMENT_SPECS.get(assessment_type)
+        if spec is None:
+            return []
         
-        return []
+        strategies = COPING_STRATEGIES[spec["condition"]]
+        return list(strategies[STRATEGY_LEVELS[bisect_left(STRATEGY_LIMITS, severity)]])
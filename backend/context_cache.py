@@ -0,0 +1,91 @@
+"""Gemini context caching for the static part of the system prompt.
+
+The system prompt only varies by profile bucket (age bucket, mood, crisis
+flag), so it can be registered once per bucket as Gemini cached content
+and referred to by handle on later calls instead of being resent. Any
+failure (unsupported model, prompt below the minimum cacheable size,
+quota) just returns no handle, and callers send the full prompt as before.
+"""
+
+import os
+import time
+
+try:
+    from google.genai import types
+except ImportError:
+    types = None
+
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))  # seconds
+
+# Stop using a handle this long before the server-side TTL runs out
+_EXPIRY_MARGIN = 60
+# Wait this long before retrying a bucket whose registration failed
+_RETRY_AFTER = 300
+# Most buckets registered at once - each one is billed server-side for its TTL
+_MAX_ENTRIES = 64
+
+
+class ContextCacheRegistry:
+    """Maps profile buckets to Gemini cached-content handles."""
+
+    def __init__(self, client, model_name, ttl=GEMINI_CONTEXT_CACHE_TTL, max_entries=_MAX_ENTRIES):
+        self.client = client
+        self.model_name = model_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._handles = {}  # bucket key -> (cache name, expires at)
+        self._failed_until = {}  # bucket key -> monotonic time of next attempt
+
+    def lookup(self, key):
+        """Return a live handle for the bucket, or None."""
+        entry = self._handles.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    async def get_or_create_async(self, key, system_prompt):
+        """Return the handle for a bucket, registering the prompt on first use."""
+        handle = self.lookup(key)
+        if handle is not None or not self._should_register(key):
+            return handle
+
+        try:
+            cached = await self.client.aio.caches.create(model=self.model_name, config=self._cache_config(key, system_prompt))
+        except Exception as e:
+            return self._record_failure(key, e)
+        return self._record(key, cached.name)
+
+    def invalidate(self, handle):
+        """Forget a handle the API no longer accepts."""
+        for key, entry in list(self._handles.items()):
+            if entry[0] == handle:
+                del self._handles[key]
+
+    def _should_register(self, key):
+        if types is None or self._failed_until.get(key, 0) > time.monotonic():
+            return False
+        if len(self._handles) + len(self._failed_until) < self.max_entries:
+            return True
+        # Full: make room only by dropping expired handles and elapsed failures
+        now = time.monotonic()
+        self._handles = {k: entry for k, entry in self._handles.items() if entry[1] > now}
+        self._failed_until = {k: until for k, until in self._failed_until.items() if until > now}
+        return len(self._handles) + len(self._failed_until) < self.max_entries
+
+    def _cache_config(self, key, system_prompt):
+        return types.CreateCachedContentConfig(
+            system_instruction=system_prompt,
+            display_name="mindful-companion-" + "-".join(str(part) for part in key),
+            ttl=f"{self.ttl}s"
+        )
+
+    def _record(self, key, handle):
+        self._handles[key] = (handle, time.monotonic() + self.ttl - _EXPIRY_MARGIN)
+        self._failed_until.pop(key, None)
+        return handle
+
+    def _record_failure(self, key, error):
+        print(f"Context caching unavailable, sending full prompt: {error}")
+        self._failed_until[key] = time.monotonic() + _RETRY_AFTER
+        return None
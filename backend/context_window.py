@@ -0,0 +1,67 @@
+"""Token-budgeted conversation window for Gemini requests."""
+
+import os
+
+from backend.prompts import estimate_tokens
+
+# Tokens of chat history sent with each request (the system prompt is not counted)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+# Keep a short running summary of user turns that no longer fit the budget
+CONTEXT_SUMMARY_ENABLED = os.getenv("CONTEXT_SUMMARY_ENABLED", "false").lower() == "true"
+SUMMARY_SNIPPET_WORDS = 12
+
+# Approximate per-message framing overhead (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def select_recent_messages(history, budget=CONTEXT_TOKEN_BUDGET):
+    """Return the newest messages that fit in the token budget, oldest first.
+
+    The latest message is always included, even if it alone exceeds the budget.
+    """
+    selected = []
+    used = 0
+    for message in reversed(history):
+        cost = estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if selected and used + cost > budget:
+            break
+        selected.append(message)
+        used += cost
+
+    selected.reverse()
+    return selected
+
+
+def summarize_snippet(text):
+    """Cheap extractive summary of a message: its first sentence, clipped to a few words."""
+    first_sentence = text.strip().split(". ")[0]
+    words = first_sentence.split()
+    if len(words) > SUMMARY_SNIPPET_WORDS:
+        return " ".join(words[:SUMMARY_SNIPPET_WORDS]) + "..."
+    return " ".join(words)
+
+
+def build_history_window(session, budget=CONTEXT_TOKEN_BUDGET):
+    """Return (recent_messages, summary) for a session.
+
+    summary is None unless CONTEXT_SUMMARY_ENABLED is set. It is updated
+    incrementally: each user turn is summarized once, when it first falls
+    out of the window.
+    """
+    history = list(session.history)
+    recent_messages = select_recent_messages(history, budget)
+
+    if not CONTEXT_SUMMARY_ENABLED:
+        return recent_messages, None
+
+    # Absolute message numbers of the first buffered message and of the window start
+    first_index = session.total_messages - len(history)
+    window_start = first_index + len(history) - len(recent_messages)
+
+    for index in range(max(session.summarized_upto, first_index), window_start):
+        message = history[index - first_index]
+        if message["role"] == "user":
+            session.summary.append(summarize_snippet(message["content"]))
+    session.summarized_upto = max(session.summarized_upto, window_start)
+
+    return recent_messages, "; ".join(session.summary) or None
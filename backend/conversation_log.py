@@ -0,0 +1,236 @@
+"""Append-only conversation log so chat history survives restarts.
+
+Every message is appended to a segment file as a length-prefixed JSON
+record, and its (session, offset) pair is appended to the segment's index
+file. Files are flushed to the OS after each append but never fsynced,
+which survives process restarts without a per-message disk sync.
+
+On start-up only the small index files are read, keeping the offsets of the
+last few messages per session. A session's history is restored by reading
+just those records through a memory map of the segments.
+
+Each process writes its own segments, so several workers can share a
+directory without locking. Segments are deleted once their index has gone
+untouched for the session idle TTL, or when the directory holds more than
+the retention count, whichever process wrote them.
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import threading
+from collections import OrderedDict, deque
+
+from backend.session_store import MAX_SESSIONS, SESSION_HISTORY_LIMIT, SESSION_IDLE_TTL
+
+# Directory for log segments; logging is off when unset
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "")
+CONVERSATION_LOG_SEGMENT_BYTES = int(os.getenv("CONVERSATION_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Segments kept in the directory before the oldest are deleted
+CONVERSATION_LOG_RETAIN_SEGMENTS = int(os.getenv("CONVERSATION_LOG_RETAIN_SEGMENTS", "8"))
+
+_LENGTH = struct.Struct(">I")  # record length prefix
+_INDEX_ENTRY = struct.Struct(">IH")  # record offset, session id length
+_MAX_SESSION_ID_BYTES = 0xFFFF  # largest length the index entry can hold
+
+
+class ConversationLog:
+    """Segmented append-only message log with a per-session offset index."""
+
+    def __init__(self, directory=CONVERSATION_LOG_DIR, restore_turns=SESSION_HISTORY_LIMIT,
+                 segment_bytes=CONVERSATION_LOG_SEGMENT_BYTES, retain_segments=CONVERSATION_LOG_RETAIN_SEGMENTS,
+                 max_sessions=MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL):
+        self.directory = directory
+        self.restore_turns = restore_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.segment_bytes = segment_bytes
+        self.retain_segments = retain_segments
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._segment_name = None
+        self._segment = None
+        self._index = None
+        os.makedirs(directory, exist_ok=True)
+
+        # LRU of session_id -> [last write time, deque of (segment name, offset)]
+        # for its most recent messages, bounded like the session store
+        self._offsets = OrderedDict()
+        self._load_indexes()
+        self._open_segment()
+
+    def append(self, session_id, role, content):
+        """Append one message to the log."""
+        payload = json.dumps(
+            {"session_id": session_id, "role": role, "content": content, "ts": time.time()},
+            ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        sid = session_id.encode("utf-8")
+        if len(sid) > _MAX_SESSION_ID_BYTES:
+            print(f"Not logging message for session id of {len(sid)} bytes (limit {_MAX_SESSION_ID_BYTES})")
+            return
+
+        with self._lock:
+            # Another process may have retired our segment; writing on would lose the messages
+            if (self._segment.tell() + _LENGTH.size + len(payload) > self.segment_bytes
+                    or os.fstat(self._segment.fileno()).st_nlink == 0):
+                self._rotate()
+
+            offset = self._segment.tell()
+            self._segment.write(_LENGTH.pack(len(payload)) + payload)
+            self._segment.flush()
+            # The index entry goes in after the record, so it never points at a partial write
+            self._index.write(_INDEX_ENTRY.pack(offset, len(sid)) + sid)
+            self._index.flush()
+            self._remember(session_id, self._segment_name, offset, time.time())
+
+    def restore(self, session_id, max_age=SESSION_IDLE_TTL):
+        """Return the session's last logged messages, oldest first.
+
+        Returns an empty list if nothing was logged or the last message is
+        older than max_age seconds (the session would have expired anyway).
+        """
+        with self._lock:
+            entry = self._offsets.get(session_id)
+            locations = list(entry[1]) if entry is not None else []
+            # Make sure everything we are about to map has reached the file
+            self._segment.flush()
+
+        messages = []
+        maps = {}
+        try:
+            for segment_name, offset in locations:
+                if segment_name not in maps:
+                    maps[segment_name] = self._map(segment_name)
+                data = maps[segment_name]
+                if data is None:
+                    continue  # Segment was retired
+                length = _LENGTH.unpack_from(data, offset)[0]
+                start = offset + _LENGTH.size
+                messages.append(json.loads(data[start:start + length]))
+        finally:
+            for data in maps.values():
+                if data is not None:
+                    data.close()
+
+        if not messages or time.time() - messages[-1]["ts"] > max_age:
+            return []
+        return messages
+
+    def close(self):
+        """Close the current segment."""
+        with self._lock:
+            self._segment.close()
+            self._index.close()
+
+    def _remember(self, session_id, segment_name, offset, written_at):
+        entry = self._offsets.get(session_id)
+        if entry is None:
+            entry = self._offsets[session_id] = [written_at, deque(maxlen=self.restore_turns)]
+        else:
+            entry[0] = max(entry[0], written_at)
+            self._offsets.move_to_end(session_id)
+        entry[1].append((segment_name, offset))
+        self._evict(written_at)
+
+    def _evict(self, now):
+        """Forget idle sessions from the LRU end, then enforce the session cap."""
+        while self._offsets:
+            written_at = next(iter(self._offsets.values()))[0]
+            if now - written_at <= self.idle_ttl:
+                break
+            self._offsets.popitem(last=False)
+
+        while len(self._offsets) > self.max_sessions:
+            self._offsets.popitem(last=False)
+
+    def _forget_segment(self, segment_name):
+        """Drop every offset pointing into a retired segment."""
+        for session_id in list(self._offsets):
+            locations = self._offsets[session_id][1]
+            kept = [location for location in locations if location[0] != segment_name]
+            if not kept:
+                del self._offsets[session_id]
+            elif len(kept) < len(locations):
+                locations.clear()
+                locations.extend(kept)
+
+    def _segment_names(self):
+        """Names of every segment in the directory, oldest first."""
+        return sorted(name[:-len(".idx")] for name in os.listdir(self.directory) if name.endswith(".idx"))
+
+    def _load_indexes(self):
+        """Read every segment's index file, oldest segment first, dropping expired and excess segments."""
+        expired_before = time.time() - self.idle_ttl
+        segment_names = self._segment_names()
+        # Leave room for the segment this process is about to open
+        excess = len(segment_names) + 1 - self.retain_segments
+        for position, segment_name in enumerate(segment_names):
+            path = os.path.join(self.directory, segment_name)
+            if position < excess or self._is_expired(path, expired_before):
+                self._delete_segment(path)
+                continue
+            with open(path + ".idx", "rb") as f:
+                data = f.read()
+            # Index entries carry no time; the index's last write is the latest it could be
+            written_at = os.path.getmtime(path + ".idx")
+
+            position = 0
+            while position + _INDEX_ENTRY.size <= len(data):
+                offset, sid_length = _INDEX_ENTRY.unpack_from(data, position)
+                position += _INDEX_ENTRY.size
+                if position + sid_length > len(data):
+                    break  # Torn final entry
+                session_id = data[position:position + sid_length].decode("utf-8")
+                position += sid_length
+                self._remember(session_id, segment_name, offset, written_at)
+
+    def _open_segment(self):
+        # Millisecond timestamp first, so names sort in write order across processes
+        self._sequence += 1
+        self._segment_name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._sequence:06d}.log"
+        path = os.path.join(self.directory, self._segment_name)
+        self._segment = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+
+    def _rotate(self):
+        """Start a new segment and retire the directory's oldest ones beyond the retention count."""
+        self._segment.close()
+        self._index.close()
+        self._open_segment()
+
+        segment_names = [name for name in self._segment_names() if name != self._segment_name]
+        # The segment just opened counts towards the retention
+        for retired in segment_names[:max(0, len(segment_names) + 1 - self.retain_segments)]:
+            self._delete_segment(os.path.join(self.directory, retired))
+            self._forget_segment(retired)
+
+    @staticmethod
+    def _is_expired(path, expired_before):
+        """True for a segment whose last message is older than any session it could restore.
+
+        A writer that is still running notices its segment is gone on the
+        next append and rotates, so age alone decides.
+        """
+        try:
+            return os.path.getmtime(path + ".idx") < expired_before
+        except OSError:
+            return False
+
+    @staticmethod
+    def _delete_segment(path):
+        for stale in (path, path + ".idx"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def _map(self, segment_name):
+        """Memory-map a segment read-only, or return None if it is gone or empty."""
+        try:
+            with open(os.path.join(self.directory, segment_name), "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
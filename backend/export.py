@@ -0,0 +1,109 @@
+"""Streaming export of per-session records as NDJSON or gzip.
+
+Each session becomes one JSON line with its transcript, profile, mood
+check-ins and assessment results. Everything is generator based: sessions
+are read from the store one at a time and written out in small batches,
+so memory use stays flat however many sessions are exported.
+
+Usage:
+    python -m backend.export [--format ndjson|gzip] [--output FILE]
+
+The CLI reads the store selected by SESSION_BACKEND, so it only sees other
+processes' sessions with SESSION_BACKEND=sqlite.
+"""
+
+import os
+import sys
+import json
+import zlib
+import argparse
+import contextlib
+
+EXPORT_FORMATS = ("ndjson", "gzip")
+# Bearer token required by the /export/sessions endpoint; the endpoint is disabled when unset
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
+
+# Sessions encoded per chunk handed to the writer
+EXPORT_BATCH_SIZE = 100
+
+
+def session_record(session):
+    """Return the exported fields of a session."""
+    # Live in-memory sessions can change mid-copy; retry the snapshot if they do
+    for _ in range(3):
+        try:
+            data = session.to_dict()
+            break
+        except RuntimeError:
+            continue
+    else:
+        data = session.to_dict()
+
+    return {
+        "session_id": data["session_id"],
+        "last_seen": data["last_seen"],
+        "total_messages": data["total_messages"],
+        "profile": data["profile"],
+        "history": data["history"],
+        "mood_history": data["mood_history"],
+        "assessments": data["assessments"]
+    }
+
+
+def iter_ndjson(sessions, batch_size=EXPORT_BATCH_SIZE):
+    """Yield NDJSON-encoded bytes, one line per session, in batches."""
+    lines = []
+    for session in sessions:
+        lines.append(json.dumps(session_record(session), ensure_ascii=False))
+        if len(lines) == batch_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_gzip(chunks):
+    """Gzip-compress a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(sessions, export_format="ndjson"):
+    """Yield the export of sessions in the requested format."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'")
+
+    chunks = iter_ndjson(sessions)
+    return iter_gzip(chunks) if export_format == "gzip" else chunks
+
+
+def main(argv=None):
+    """Write every stored session to a file or stdout."""
+    parser = argparse.ArgumentParser(description="Export chatbot sessions as NDJSON.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from backend.session_store import SESSION_BACKEND, create_session_store
+
+    if SESSION_BACKEND != "sqlite":
+        print("Warning: SESSION_BACKEND is not 'sqlite', so no other process's sessions are visible", file=sys.stderr)
+
+    # Keep store start-up messages out of an export written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        store = create_session_store()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in iter_export(store.iter_sessions(), args.format):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
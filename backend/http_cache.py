@@ -0,0 +1,173 @@
+"""HTTP caching and compression for backend responses.
+
+Constant JSON payloads (questionnaires, crisis resources, the session
+catalogue) are serialized and compressed once into StaticResource objects,
+which answer conditional requests with 304 and pick gzip or brotli from
+Accept-Encoding. CompressionMiddleware compresses other JSON responses
+above a size threshold; streamed bodies (SSE, NDJSON) are passed through
+untouched. Brotli is used when the brotli package is installed.
+"""
+
+import os
+import gzip
+import json
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Seconds clients may reuse a static resource before revalidating it
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+# JSON responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Supported codings, most preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body, encoding, static=False):
+    """Compress body with a content coding; static bodies get the slowest, smallest setting."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if static else 4)
+    # mtime=0 keeps the output (and so its ETag) identical across restarts
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+def negotiate_encoding(accept_encoding, available=ENCODINGS):
+    """Pick a coding from available (in preference order) for an Accept-Encoding header.
+
+    Returns None when the body should be sent as is.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def etag_matches(if_none_match, etags):
+    """Whether an If-None-Match header names any of etags."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") in etags for tag in if_none_match.split(","))
+
+
+class StaticResource:
+    """A constant JSON payload, serialized, compressed and tagged once."""
+
+    __slots__ = ("body", "etag", "cache_control", "_encoded", "_etags")
+
+    def __init__(self, payload, max_age=STATIC_MAX_AGE):
+        self.body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.cache_control = f"public, max-age={max_age}"
+        self._encoded = {encoding: compress(self.body, encoding, static=True) for encoding in ENCODINGS}
+        # Each encoding is its own representation, so it gets its own strong ETag
+        self._etags = {None: self.etag}
+        self._etags.update({encoding: f'"{digest}-{encoding}"' for encoding in ENCODINGS})
+
+    def is_current(self, if_none_match):
+        """Whether an If-None-Match header names any encoding of this payload."""
+        return etag_matches(if_none_match, self._etags.values())
+
+    def response(self, if_none_match=None, accept_encoding=None):
+        """Build the response for a request's If-None-Match and Accept-Encoding headers."""
+        encoding = negotiate_encoding(accept_encoding)
+        headers = {
+            "ETag": self._etags[encoding],
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        # A client holding any encoding of this payload has the current version
+        if self.is_current(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is None:
+            return Response(self.body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self._encoded[encoding], media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON responses of at least minimum_size bytes.
+
+    Only complete bodies are compressed: a response sent in several parts
+    (StreamingResponse, server-sent events) goes through as it is, so
+    streamed chunks still reach the client as soon as they are written.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (not headers.get("content-type", "").startswith("application/json")
+                        or "content-encoding" in headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers back until we know how big the body is
+                    start_message = message
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
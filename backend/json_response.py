@@ -0,0 +1,47 @@
+"""Fast JSON responses for the API.
+
+FastJSONResponse encodes with orjson when it is installed and falls back
+to the same compact stdlib encoding as Starlette's JSONResponse. Endpoints
+on the hot path return it directly, which also skips FastAPI's
+jsonable_encoder pass over the payload.
+
+Constant parts of a payload can be wrapped with fragment() once at import:
+with orjson 3.10+ they are spliced into every response as pre-encoded
+bytes, otherwise they are encoded as ordinary values.
+"""
+
+import json
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_Fragment = getattr(orjson, "Fragment", None)
+
+
+def dumps(content):
+    """Encode content as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fragment(payload):
+    """Pre-encode a constant payload for embedding in responses, where orjson supports it.
+
+    Only pass the result to dumps() or FastJSONResponse - the stdlib json
+    module and jsonable_encoder can't encode an orjson Fragment.
+    """
+    if _Fragment is None:
+        return payload
+    return _Fragment(dumps(payload))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available."""
+
+    def render(self, content):
+        return dumps(content)
@@ -0,0 +1,186 @@
+"""Keyword tables and a compiled multi-pattern matcher for message analysis.
+
+Every keyword table used by the chatbot is compiled into a single
+Aho-Corasick automaton at import time, so a message is lowercased and
+scanned once no matter how many callers need to know what it contains.
+Matching is plain substring matching, the same as `keyword in text`.
+"""
+
+from collections import deque
+
+# Crisis detection
+CRISIS_KEYWORDS = [
+    # Direct self-harm indicators
+    "suicide", "kill myself", "end my life", "want to die",
+    "hurt myself", "self harm", "cutting myself", "no reason to live",
+
+    # New patterns from examples
+    "don't want to live like this anymore", "don't want to live anymore",
+    "everything feels pointless", "everything is pointless",
+    "people would be better off without me", "better off without me",
+    "feel like I can't keep going", "can't keep going",
+    "wish I could just disappear", "want to disappear",
+    "no point in living", "life is meaningless",
+
+    # Indirect but concerning patterns
+    "give up completely", "nothing matters anymore",
+    "tired of everything", "can't take it anymore",
+    "world without me", "everyone hates me"
+]
+
+# Sentiment scoring
+NEGATIVE_WORDS = ["sad", "depressed", "anxious", "worried", "hopeless",
+                  "stressed", "overwhelmed", "tired", "exhausted", "lonely"]
+POSITIVE_WORDS = ["happy", "calm", "peaceful", "hopeful", "excited",
+                  "grateful", "relaxed", "confident", "loved", "supported"]
+
+# Healing poetry triggers
+POETRY_TRIGGERS = {
+    "sadness": ["sad", "lonely", "empty", "hopeless", "lost", "depressed", "down", "terrible", "awful"],
+    "anxiety": ["anxious", "nervous", "worried", "scared", "panic", "overwhelmed", "stress"],
+    "comfort": ["something soft", "hug", "comfort me", "pamper", "gentle words", "make me feel better"],
+    "loneliness": ["alone", "isolated", "nobody", "no one"],
+    "self_doubt": ["not good enough", "worthless", "hate myself", "stupid", "failure", "useless"],
+    "crisis": ["want to die", "kill myself", "end it all", "no point", "better off dead"],
+    "breathing": ["breathe", "relax", "calm"],
+    "breathing_help": ["help", "technique", "exercise"],
+}
+
+# Fallback response topics
+FALLBACK_TRIGGERS = {
+    "greeting": ["hello", "hi", "hey"],
+    "sadness": ["sad", "depress", "down", "empty", "low"],
+    "anxiety": ["anxious", "anxiety", "worry"],
+    "stress": ["stress", "overwhelm"],
+    "thanks": ["thank"],
+    "comfort": ["comfort", "sweet", "make me feel better", "pampering"],
+    "loneliness": ["lonely", "alone", "understand"],
+    "self_doubt": ["confidence", "doubt", "burden", "worth"],
+    "okay": ["bored", "okay"],
+    "story": ["story", "calm"],
+    "breathing": ["breathing", "exercise"],
+    "tip": ["tip"],
+    "self_care": ["self-care"],
+    "relax": ["relax", "calm", "technique", "trick"],
+    "study": ["exam", "test", "study"],
+    "work": ["work"],
+    "goodbye": ["bye", "goodbye"],
+}
+
+# Assessment suggestion
+DEPRESSION_KEYWORDS = ["sad", "depressed", "hopeless", "worthless", "tired all the time",
+                       "no interest", "no motivation", "empty", "numb", "can't enjoy"]
+ANXIETY_KEYWORDS = ["anxious", "worried", "nervous", "panic", "stress", "overwhelmed",
+                    "can't relax", "racing thoughts", "fear", "dread", "on edge"]
+
+
+def _build_keyword_tables():
+    """Flatten every keyword table into {category: keywords}."""
+    tables = {
+        "crisis": CRISIS_KEYWORDS,
+        "sentiment_negative": NEGATIVE_WORDS,
+        "sentiment_positive": POSITIVE_WORDS,
+        "assessment_depression": DEPRESSION_KEYWORDS,
+        "assessment_anxiety": ANXIETY_KEYWORDS,
+    }
+    for name, keywords in POETRY_TRIGGERS.items():
+        tables[f"poetry_{name}"] = keywords
+    for name, keywords in FALLBACK_TRIGGERS.items():
+        tables[f"fallback_{name}"] = keywords
+    return tables
+
+
+class KeywordMatches:
+    """The keywords found in one message, grouped by category."""
+
+    __slots__ = ("_hits",)
+
+    def __init__(self, hits):
+        self._hits = hits
+
+    def has(self, category):
+        """Return True if any keyword of the category was found."""
+        return category in self._hits
+
+    def count(self, category):
+        """Return how many distinct keywords of the category were found."""
+        return len(self._hits.get(category, ()))
+
+    def keywords(self, category):
+        """Return the distinct keywords of the category that were found."""
+        return self._hits.get(category, frozenset())
+
+    def __repr__(self):
+        return f"KeywordMatches({self._hits!r})"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a set of categorized keywords."""
+
+    def __init__(self, tables):
+        # Trie nodes: transitions, failure link and (category, keyword) outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), category)
+
+        self._link()
+
+    def _add(self, keyword, category):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node] += ((category, keyword),)
+
+    def _link(self):
+        """Compute failure links breadth-first and merge suffix outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+                queue.append(child)
+
+    def match(self, text, lowercase=True):
+        """Scan text once and return every matched keyword by category.
+        
+        Pass lowercase=False when the text has already been lowercased.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = {}
+        node = 0
+        for char in (text.lower() if lowercase else text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for category, keyword in output[node]:
+                found = hits.get(category)
+                if found is None:
+                    hits[category] = {keyword}
+                else:
+                    found.add(keyword)
+
+        return KeywordMatches({category: frozenset(found) for category, found in hits.items()})
+
+
+# Compiled once at import and shared by every caller
+MATCHER = KeywordMatcher(_build_keyword_tables())
+
+
+def match_keywords(text, lowercase=True):
+    """Return the KeywordMatches for a message."""
+    return MATCHER.match(text, lowercase)
@@ -0,0 +1,127 @@
+"""In-process latency histograms and counters in Prometheus text format.
+
+Dependency-free: metrics are kept per process and rendered by the /metrics
+route. With several workers each one reports its own numbers.
+"""
+
+import time
+import threading
+from contextlib import ContextDecorator
+
+# Latency buckets in seconds, from keyword matching (sub-millisecond) up to slow Gemini calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by one label."""
+
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = (label,) if label else ()
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value=None, amount=1):
+        """Add amount to the counter (for label_value, if the counter has a label)."""
+        key = (label_value,) if self.labels else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by one label."""
+
+    def __init__(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = (label,) if label else ()
+        self.buckets = buckets
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        """Record one observation."""
+        key = (label_value,) if self.labels else ()
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+
+        for key, series in sorted(snapshot.items()):
+            names = self.labels + ("le",)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class stage_timer(ContextDecorator):
+    """Time a block (or a sync function, as a decorator) into the chat stage histogram.
+
+    Don't decorate async functions with it - that would only time creating the coroutine.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._starts = threading.local()
+
+    def __enter__(self):
+        # Thread-local stack so one decorator instance can be re-entered concurrently
+        stack = getattr(self._starts, "stack", None)
+        if stack is None:
+            stack = self._starts.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc_info):
+        CHAT_STAGE_SECONDS.observe(time.perf_counter() - self._starts.stack.pop(), self.stage)
+        return False
+
+
+CHAT_STAGE_SECONDS = Histogram(
+    "mindful_chat_stage_seconds", "Time spent in each stage of a chat turn.", label="stage"
+)
+CHAT_RESPONSES = Counter(
+    "mindful_chat_responses_total", "Chat replies by source (api or fallback).", label="source"
+)
+
+METRICS = (CHAT_STAGE_SECONDS, CHAT_RESPONSES)
+
+
+def render_metrics(extra_lines=()):
+    """Render all registered metrics, plus any extra lines, in Prometheus text format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
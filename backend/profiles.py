@@ -0,0 +1,75 @@
+"""Per-session user profiles.
+
+Everything derived from a profile (age bucket, response age group, prompt
+templates) is worked out once when the profile is set, so chat turns only
+read precomputed fields.
+"""
+
+from backend.prompts import get_prompt_template
+from backend.responses import age_group
+from backend.utils import age_bucket
+
+DEFAULT_AGE = 25
+DEFAULT_MOOD = "unknown"
+DEFAULT_NAME = "friend"
+
+
+def describe_age(age):
+    """Human-readable age group used in the legacy system prompt."""
+    if 5 <= age <= 12:
+        return "child (5-12)"
+    elif 13 <= age <= 17:
+        return "teenager (13-17)"
+    elif 18 <= age <= 25:
+        return "young adult (18-25)"
+    elif 26 <= age <= 64:
+        return "adult (26-64)"
+    else:
+        return "senior (65+)"
+
+
+class UserProfileRecord:
+    """A user's profile plus the values derived from it."""
+
+    __slots__ = ("name", "age", "goals", "current_mood",
+                 "bucket", "group", "age_label", "template", "crisis_template")
+
+    def __init__(self, name=None, age=DEFAULT_AGE, goals=(), current_mood=DEFAULT_MOOD):
+        self.name = name
+        self.age = age
+        self.goals = tuple(goals)
+        self.current_mood = current_mood
+
+        self.bucket = age_bucket(age)
+        self.group = age_group(age)
+        self.age_label = describe_age(age)
+        self.template = get_prompt_template(self.bucket, current_mood, False)
+        self.crisis_template = get_prompt_template(self.bucket, current_mood, True)
+
+    @property
+    def display_name(self):
+        """The name to address the user by."""
+        return self.name or DEFAULT_NAME
+
+    def system_prompt(self, is_crisis=False):
+        """Render the system prompt for this profile."""
+        template = self.crisis_template if is_crisis else self.template
+        return template.substitute(user_name=self.display_name)
+
+    def to_dict(self):
+        """Return the profile fields as a JSON-serializable dict."""
+        return {"name": self.name, "age": self.age, "goals": list(self.goals), "current_mood": self.current_mood}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from profile fields (as sent to /set-profile)."""
+        return cls(
+            name=data.get("name"),
+            age=data.get("age", DEFAULT_AGE),
+            goals=data.get("goals") or (),
+            current_mood=data.get("current_mood", DEFAULT_MOOD)
+        )
+
+
+# Used for sessions that never set a profile
+DEFAULT_PROFILE = UserProfileRecord()
@@ -0,0 +1,85 @@
+"""Opt-in cache of Gemini completions for short, repeated messages."""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))  # seconds
+# Only short openers ("hi", "i feel anxious", "thank you") are context-free enough to share
+RESPONSE_CACHE_MAX_WORDS = int(os.getenv("RESPONSE_CACHE_MAX_WORDS", "6"))
+
+# Stands in for the user's name inside cached replies
+NAME_PLACEHOLDER = "{name}"
+
+_NON_WORD = re.compile(r"[^\w']+")
+_ELONGATED = re.compile(r"(\w)\1{2,}")
+
+
+def normalize_cache_text(text):
+    """Reduce a message to a cache key: lowercase words, no punctuation or emoji, no stretched letters."""
+    text = _NON_WORD.sub(" ", text.lower())
+    text = _ELONGATED.sub(r"\1", text)  # "hiii" -> "hi"
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with TTL expiry and hit/miss counters."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 max_words=RESPONSE_CACHE_MAX_WORDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_words = max_words
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, text, age_bucket, mood, is_crisis):
+        """Return the cache key for a message, or None if it must not be cached.
+
+        The key covers everything the system prompt varies by besides the name.
+        """
+        # Crisis turns always get a fresh, fully contextual reply
+        if is_crisis:
+            return None
+
+        normalized = normalize_cache_text(text)
+        if not normalized or len(normalized.split()) > self.max_words:
+            return None
+
+        return (normalized, age_bucket, mood, is_crisis)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,199 @@
+"""Static response tables for the mental health chatbot.
+
+Fallback replies, healing poems and poem introductions are built once at
+import into immutable tables. Entries are plain templates with a {name}
+placeholder; only the entry that gets picked is personalized, so serving
+a fallback reply costs a lookup and a single string replace.
+"""
+
+import random
+from types import MappingProxyType
+
+from backend.utils import age_bucket
+
+NAME_FIELD = "{name}"
+
+
+def personalize(template, user_name):
+    """Fill the user's name into a response template."""
+    return template.replace(NAME_FIELD, user_name)
+
+
+def pick_response(responses, user_name):
+    """Pick one response template at random and personalize only that one."""
+    return personalize(random.choice(responses), user_name)
+
+
+def age_group(user_age):
+    """Map an age to the child/teen/adult variants used by the response tables."""
+    bucket = age_bucket(user_age)
+    return "adult" if bucket == "senior" else bucket
+
+
+# Healing poetry for therapeutic responses
+HEALING_POEMS = MappingProxyType({
+    "sadness_loneliness": (
+        "Even when the night feels long,\nthe stars are quietly shining for you.\nYou are never truly alone,\nthe world still whispers your name with love. 🌌",
+        "In the quiet of your sorrow,\ngentle light is waiting near.\nYour heart deserves tomorrow's hope,\nand love will always find you here. 💫",
+        "Though shadows dance around your soul,\nyour light can never truly fade.\nRest now in this gentle moment,\nyou are loved, you are not afraid. 🌙",
+    ),
+    "anxiety_stress": (
+        "Breathe in calm, breathe out the storm,\nyour heart is safe, your spirit warm.\nOne gentle step, one steady light,\nyou'll find your peace, your wings for flight. 🌬️🕊️",
+        "In the rush of worried thoughts,\nfind the stillness in your chest.\nYour breath can be your anchor now,\nguiding you to peaceful rest. 🌊",
+        "Let the rhythm of your heartbeat\nbe the song that calms your mind.\nIn this moment, you are safe here,\npeace and comfort you will find. 💙",
+    ),
+    "self_love": (
+        "Like flowers turning toward the sun,\nyour soul deserves to bloom.\nBe gentle with your roots today,\nthey are growing strength for tomorrow. 🌸",
+        "You are worthy of the kindness\nthat you give to everyone.\nTreat yourself with that same love,\nyou are precious, you are enough. 🌺",
+        "In the mirror of your heart,\nsee the beauty shining bright.\nYou deserve all love and care,\nyou are worthy of delight. ✨",
+    ),
+    "comfort_pampering": (
+        "Wrap yourself in words of care,\nlike a blanket soft and true.\nMay kindness be your steady song,\nand love always find you. 🧸💙",
+        "Let these words be gentle arms\nthat hold you close and tight.\nYou deserve this moment's peace,\neverything will be alright. 🤗",
+        "In this space of quiet comfort,\nfeel the warmth that surrounds you.\nYou are cherished, you are valued,\nlet this love gently astound you. 💕",
+    ),
+    "children_magical": (
+        "Little star, up in the sky ✨\nyou sparkle bright, and so do I.\nEven when clouds come rolling near,\nyour light will always shine clear. 🌈🌟",
+        "Magic lives inside your heart,\nbraver than the biggest bear.\nWhen you feel a little scared,\nremember love is everywhere. 🐻✨",
+        "You're a rainbow after rain,\na sunbeam bright and true.\nThe world is full of wonder,\nand it's lucky to have you. 🌈☀️",
+    ),
+    "breathing_relaxation": (
+        "Breathe in the light, let shadows fade,\na calm new space within is made.\nWith every breath, feel peace grow near,\nyou are safe, you are held here. 🌿",
+        "In and out, like gentle waves,\nyour breath can wash your fears away.\nLet this rhythm be your guide,\nto peace that's always here to stay. 🌊",
+        "Feel the air fill up your chest,\nlike love flowing through your soul.\nWith each breath, you're growing calm,\nfeeling peaceful, feeling whole. 💨💙",
+    ),
+})
+
+# Gentle introduction before a poem, by age group
+POEM_INTROS = MappingProxyType({
+    "child": "Here's something special for you, little {name} 🌟:\n\n",
+    "teen": "Let me share something beautiful with you, {name} 💙:\n\n",
+    "adult": "Here's a gentle poem for your heart, dear {name} 🌸:\n\n",
+})
+
+CRISIS_RESPONSE = (
+    "I hear your pain, and I care deeply, {name} 🌸. You are not alone, and you matter so much. "
+    "You are safe here with me 💕. Would it help to talk about what's making you feel this way? "
+    "I'm here to listen with all my heart."
+)
+
+COMFORT_RESPONSE = "Of course, dear {name} 💕. You deserve all the comfort in the world."
+
+# Teens and adults share the same "okay" replies
+_OKAY_OLDER = (
+    "Sometimes okay is exactly where we need to be, {name} 🌿. You don't have to be amazing every day - you're enough just as you are 💙.",
+    "I hear you, {name} 🌸. Those quiet, 'okay' moments can actually be really peaceful. How can I make this moment a little brighter for you? ✨",
+)
+
+# Fallback replies by topic; age-dependent topics map age group -> replies
+FALLBACK_RESPONSES = MappingProxyType({
+    "greeting": MappingProxyType({
+        "child": (
+            "Hi there, beautiful {name}! 🌈✨ It's so wonderful to see you today! How are you feeling, little star?",
+            "Hello, sweet {name}! 🌸🐻 I'm so happy you're here! What magical thing happened in your day?",
+            "Hey, amazing {name}! 🌟 You brighten my day just by being here! How are you doing today?",
+        ),
+        "teen": (
+            "Hey {name}! 💙 Really great to see you here. How are you feeling today?",
+            "Hi there, {name}! 🌸 I'm so glad you reached out. What's going on in your world?",
+            "Hello {name}! ✨ You're brave for being here. How has your day been treating you?",
+        ),
+        "adult": (
+            "Hi {name} 🌿 It's really nice to see you today. You are safe here 💕. How are you feeling?",
+            "Hello, dear {name} 🌸 I'm so glad you're here. Consider this a gentle space just for you. What's on your mind?",
+            "Hey there, {name} 💙 You deserve care and kindness today. How can I support you?",
+        ),
+    }),
+    "sadness": (
+        "I hear you're feeling really heavy right now, {name} 💙. Those feelings are so valid, and you're so brave for sharing them with me. You are safe here 💕.",
+        "Oh {name}, I can feel the sadness in your words 🌸. That must be so exhausting to carry. You deserve all the gentleness in the world right now.",
+        "Thank you for trusting me with these feelings, {name} 🌿. Sadness can feel so isolating, but you're not alone - I'm here with you, and you matter deeply.",
+    ),
+    "anxiety": (
+        "I can feel that anxious energy with you, {name} 🌸. Your mind must feel like it's racing - that's so overwhelming. You are safe here, and we can slow down together 💙.",
+        "Anxiety can be so exhausting, dear {name} 🌿. I hear you, and I want you to know you're incredibly brave for reaching out. Let's breathe through this gently together.",
+        "Those worried thoughts sound so heavy, {name} 💕. You're doing the right thing by talking about them. You deserve peace and calm - let's find some together.",
+    ),
+    "stress": (
+        "It sounds like you have a lot on your plate right now, {name}. When everything feels overwhelming, even small tasks can seem impossible.",
+        "{name}, stress can be so draining. What's been the biggest source of pressure for you lately?",
+        "I can imagine how exhausting that must feel, {name}. Sometimes we need to give ourselves permission to just breathe.",
+    ),
+    "thanks": (
+        "You're so welcome, {name}! I'm just glad I could be here for you. How are you feeling now?",
+        "I'm happy I could help, {name}. Is there anything else you'd like to talk through?",
+        "Of course, {name}! That's what I'm here for. You're doing great by taking care of yourself.",
+    ),
+    "loneliness": (
+        "You're not alone, sweet {name} 🌸. I see you, I hear you, and you matter so much. Consider this a gentle hug in words 🤗.",
+        "Loneliness can feel so heavy, {name} 💙. But right here, right now, you are seen and valued. You deserve connection and love 💕.",
+        "I understand that feeling, dear {name} 🌿. Sometimes it feels like no one gets it, but I'm here with you, and you are worthy of understanding.",
+    ),
+    "self_doubt": (
+        "Oh {name}, you are not a burden - you are a gift 🌸. Those doubts are lying to you. You deserve love, respect, and kindness 💕.",
+        "I hear those self-doubts, {name} 💙. But let me tell you what I see: someone brave enough to reach out, someone worthy of care. You matter deeply 🌿.",
+        "Those confidence struggles are so hard, dear {name} 🌸. You are enough, just as you are. Be gentle with yourself today 💕.",
+    ),
+    "okay": MappingProxyType({
+        "child": (
+            "Aww, feeling a little bored, {name}? 🌈 That's totally okay! Maybe we could think of something fun together? What makes you smile? ✨",
+            "Sometimes okay days are just fine, little star {name} 🌟. You don't always have to feel amazing - you're perfect just as you are! 🐻",
+        ),
+        "teen": _OKAY_OLDER,
+        "adult": _OKAY_OLDER,
+    }),
+    "story": (
+        "Of course, {name} 🌸. Close your eyes and imagine a gentle meadow where wildflowers dance in the soft breeze, and every step you take feels like walking on clouds of peace 🌿💙.",
+        "Here's a little peace for you, {name} 💕: Picture yourself by a quiet lake where the water reflects the most beautiful sunset, and every breath you take fills you with warmth and safety 🌅.",
+        "Let me paint you a calm scene, dear {name} 🌸: You're in a cozy reading nook with the softest blanket, warm tea, and all the time in the world just for you ☕🤗.",
+    ),
+    "breathing": (
+        "Beautiful choice, {name} 🌸. Let's breathe together: In for 4... hold for 4... out for 6. You're doing wonderfully. Feel that calm flowing through you 💙.",
+        "I'm so proud of you for asking, {name} 💕. Try this with me: Breathe in peace... hold it gently... breathe out all the stress. You deserve this moment of calm 🌿.",
+        "What a loving thing to do for yourself, {name} 🌸. Let's try the 5-4-3-2-1: 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste. You're safe here 💙.",
+    ),
+    "self_care_tip": (
+        "Here's a gentle self-care tip for you, {name} 🌸: Take 3 deep breaths and tell yourself 'I am worthy of love and kindness.' You deserve to hear that 💕.",
+        "Sweet {name}, try this: Put your hand on your heart and feel it beating. That's your body taking care of you. You deserve the same care from yourself 💙🌿.",
+        "Here's some love for you, {name} 🌸: Do one tiny thing that makes you smile today - even just looking at something beautiful counts. You matter 💕.",
+    ),
+    "relax": (
+        "Of course, {name}! Try the 5-4-3-2-1 grounding technique: name 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste. It helps bring you back to the present moment.",
+        "Here's a quick one, {name}: breathe in for 4 counts, hold for 4, breathe out for 6. This activates your body's relaxation response. Try it a few times!",
+        "Try this, {name}: tense all your muscles for 5 seconds, then release completely. It's called progressive muscle relaxation and it really works!",
+    ),
+    "study": (
+        "Exam stress is so common, {name}. Try breaking your study into small chunks and take breaks every 25 minutes. Your brain actually absorbs more that way!",
+        "I understand that pressure, {name}. Remember to breathe deeply before the exam, and trust that you've prepared. Sometimes our anxiety makes us forget what we actually know.",
+        "Study anxiety is tough, {name}. Try reviewing your notes out loud - it helps with retention. And remember, one exam doesn't define your worth!",
+    ),
+    "work": (
+        "Work stress can feel so consuming, {name}. Try setting small, achievable goals for each day. What's one thing you could tackle first?",
+        "That work pressure sounds intense, {name}. Have you been able to take any real breaks? Even 5 minutes of deep breathing can help reset your mind.",
+        "I hear you, {name}. Work overwhelm is exhausting. Remember it's okay to say no to additional tasks when you're already stretched thin.",
+    ),
+    "goodbye": (
+        "Take care of yourself, {name}. Remember, I'm always here when you need someone to talk to. You've got this!",
+        "It was really good talking with you, {name}. Be gentle with yourself, and feel free to come back anytime.",
+        "Goodbye for now, {name}. I hope you carry some peace with you today. I'll be here whenever you need support.",
+    ),
+    "general": MappingProxyType({
+        "child": (
+            "I'm here to listen to you, sweet {name} 🌟. What's been happening in your magical world today?",
+            "You can tell me anything, little star {name} 🌈. What would make you feel happy to share?",
+            "I care about you so much, {name} ✨. What's the most important thing you want to talk about?",
+        ),
+        "teen": (
+            "I'm here for you, {name} 💙. What's been on your mind lately?",
+            "You're safe to share anything with me, {name} 🌸. What would feel good to talk about?",
+            "I really want to understand what you're going through, {name} 💕. What's happening in your world?",
+        ),
+        "adult": (
+            "You are safe here with me, {name} 🌿. What's been weighing on your heart lately?",
+            "I'm here to listen with all the care in the world, dear {name} 💙. What would feel good to share right now?",
+            "You deserve to be heard and understood, {name} 🌸. What's the most important thing happening in your world right now?",
+            "Consider this a gentle space just for you, {name} 💕. I'm here for whatever you need to express.",
+            "Take all the time you need, sweet {name} 🌿. You matter, and your feelings matter too.",
+        ),
+    }),
+})
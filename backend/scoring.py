@@ -0,0 +1,107 @@
+"""Bulk PHQ-9 / GAD-7 scoring for clinic imports.
+
+A batch of response vectors is validated as one array, then scores,
+severity bands and coping strategy levels are computed in a single pass.
+NumPy is used when it is installed; otherwise a pure-Python loop gives
+the same results.
+"""
+
+import os
+from bisect import bisect_left
+
+from backend.assessment import (
+    ASSESSMENT_SPECS, MAX_ITEM_SCORE, MIN_ITEM_SCORE, STRATEGY_LEVELS, STRATEGY_LIMITS,
+    validate_responses
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_BATCH_ASSESSMENTS = int(os.getenv("MAX_BATCH_ASSESSMENTS", "10000"))
+
+
+class BatchValidationError(ValueError):
+    """A response vector in a batch is invalid."""
+
+    def __init__(self, row, message):
+        super().__init__(f"Row {row}: {message}")
+        self.row = row
+
+
+def score_batch(assessment_type, batch):
+    """Score a batch of response vectors of one assessment type.
+
+    Returns (scores, severity_bands, strategy_levels) as parallel lists of
+    ints; bands index the spec's severity_labels, levels index STRATEGY_LEVELS.
+    Raises ValueError for an unknown type or oversized batch, and
+    BatchValidationError naming the first invalid row.
+    """
+    spec = ASSESSMENT_SPECS.get(assessment_type)
+    if spec is None:
+        raise ValueError("Invalid assessment type")
+    if len(batch) > MAX_BATCH_ASSESSMENTS:
+        raise ValueError(f"Batch too large: at most {MAX_BATCH_ASSESSMENTS} assessments per request")
+    if not batch:
+        return [], [], []
+
+    if np is not None:
+        return _score_batch_numpy(assessment_type, spec, batch)
+    return _score_batch_python(assessment_type, spec, batch)
+
+
+def _score_batch_numpy(assessment_type, spec, batch):
+    try:
+        matrix = np.array(batch, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        matrix = None  # Ragged rows, or values too large for int64
+
+    if matrix is None or matrix.ndim != 2 or matrix.shape[1] != spec["items"]:
+        _raise_first_invalid(assessment_type, batch)
+
+    out_of_range = (matrix < MIN_ITEM_SCORE) | (matrix > MAX_ITEM_SCORE)
+    if out_of_range.any():
+        _raise_first_invalid(assessment_type, batch, int(out_of_range.any(axis=1).argmax()))
+
+    scores = matrix.sum(axis=1)
+    bands = np.searchsorted(spec["band_limits"], scores, side="left")
+    levels = np.searchsorted(STRATEGY_LIMITS, scores, side="left")
+    return scores.tolist(), bands.tolist(), levels.tolist()
+
+
+def _score_batch_python(assessment_type, spec, batch):
+    scores, bands, levels = [], [], []
+    for row, responses in enumerate(batch):
+        try:
+            validate_responses(assessment_type, responses)
+        except ValueError as e:
+            raise BatchValidationError(row, str(e))
+
+        score = sum(responses)
+        scores.append(score)
+        bands.append(bisect_left(spec["band_limits"], score))
+        levels.append(bisect_left(STRATEGY_LIMITS, score))
+    return scores, bands, levels
+
+
+def _raise_first_invalid(assessment_type, batch, start=0):
+    """Re-check rows one by one from start and raise for the first invalid one."""
+    for row in range(start, len(batch)):
+        try:
+            validate_responses(assessment_type, batch[row])
+        except ValueError as e:
+            raise BatchValidationError(row, str(e))
+    raise ValueError("Invalid batch")
+
+
+def iter_batch_results(assessment_type, scores, bands, levels):
+    """Yield one result record per scored assessment."""
+    labels = ASSESSMENT_SPECS[assessment_type]["severity_labels"]
+    for index, (score, band, level) in enumerate(zip(scores, bands, levels)):
+        yield {
+            "index": index,
+            "score": score,
+            "interpretation": labels[band],
+            "strategy_level": STRATEGY_LEVELS[level]
+        }
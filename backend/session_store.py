@@ -0,0 +1,422 @@
+"""Per-session conversation state for the mental health chatbot.
+
+Two interchangeable stores are provided: SessionStore keeps sessions in
+process memory (the default, single worker), SQLiteSessionStore keeps them
+in a shared SQLite database in WAL mode so several uvicorn workers see the
+same sessions. Both expose get / peek / save / remove.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import Counter, OrderedDict, deque
+
+from backend.profiles import UserProfileRecord
+
+# Bounded memory settings - total history is capped at MAX_SESSIONS * SESSION_HISTORY_LIMIT messages
+SESSION_HISTORY_LIMIT = int(os.getenv("SESSION_HISTORY_LIMIT", "20"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))  # seconds
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "5000"))
+MAX_MESSAGE_CHARS = int(os.getenv("MAX_MESSAGE_CHARS", "2000"))
+ASSESSMENT_WINDOW = int(os.getenv("ASSESSMENT_WINDOW", "3"))  # user turns considered for assessment suggestions
+SUMMARY_MAX_POINTS = int(os.getenv("SUMMARY_MAX_POINTS", "5"))  # summarized older user turns kept per session
+MOOD_HISTORY_LIMIT = int(os.getenv("MOOD_HISTORY_LIMIT", "50"))
+ASSESSMENT_HISTORY_LIMIT = int(os.getenv("ASSESSMENT_HISTORY_LIMIT", "20"))
+
+# "memory" keeps sessions in this process; "sqlite" shares them between workers
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+# Keyword categories tracked for assessment suggestions
+ASSESSMENT_CATEGORIES = ("assessment_depression", "assessment_anxiety")
+
+
+class Session:
+    """Conversation state for a single session."""
+
+    __slots__ = ("session_id", "history", "last_seen", "total_messages",
+                 "assessment_window", "assessment_keywords", "assessment_counts",
+                 "summary", "summarized_upto", "profile", "mood_history", "assessments",
+                 "version", "pending")
+
+    def __init__(self, session_id, history_limit=SESSION_HISTORY_LIMIT):
+        self.session_id = session_id
+        # Ring buffer - oldest turns fall off automatically
+        self.history = deque(maxlen=history_limit)
+        # Wall-clock time so it stays meaningful when shared between processes
+        self.last_seen = time.time()
+        self.total_messages = 0
+        
+        # Assessment keywords seen in the last few user turns, maintained incrementally
+        self.assessment_window = deque()
+        self.assessment_keywords = Counter()
+        self.assessment_counts = dict.fromkeys(ASSESSMENT_CATEGORIES, 0)
+        
+        # Running summary of older turns that no longer fit the context window
+        self.summary = deque(maxlen=SUMMARY_MAX_POINTS)
+        self.summarized_upto = 0
+        
+        # User profile (a UserProfileRecord, None until set) and mood check-ins for this session
+        self.profile = None
+        self.mood_history = deque(maxlen=MOOD_HISTORY_LIMIT)
+        self.assessments = deque(maxlen=ASSESSMENT_HISTORY_LIMIT)
+        
+        # Stored row version, and the changes made since loading it (None when the
+        # session is a live object that needs no merging - see SQLiteSessionStore.save)
+        self.version = 0
+        self.pending = None
+
+    def add_message(self, role, content):
+        """Append a message to the session history, truncating oversized content."""
+        self.apply_change(("message", {"role": role, "content": content[:MAX_MESSAGE_CHARS]}))
+
+    def set_profile(self, profile):
+        """Set the session's UserProfileRecord."""
+        self.apply_change(("profile", profile))
+
+    def record_analysis(self, analysis):
+        """Slide the assessment keyword window forward by one user turn.
+        
+        Stores the distinct assessment keywords per category currently in the
+        window on the analysis (depression_count / anxiety_count).
+        """
+        turn_keywords = [(category, keyword)
+                         for category in ASSESSMENT_CATEGORIES
+                         for keyword in analysis.matches.keywords(category)]
+        self.apply_change(("keywords", turn_keywords))
+        
+        analysis.depression_count = self.assessment_counts["assessment_depression"]
+        analysis.anxiety_count = self.assessment_counts["assessment_anxiety"]
+
+    def add_mood(self, mood, value=None, timestamp=None):
+        """Record a mood check-in; timestamp is in epoch seconds and defaults to now."""
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        self.apply_change(("mood", {"mood": mood, "value": value, "timestamp": timestamp}))
+
+    def add_assessment(self, assessment_type, score, interpretation):
+        """Record a completed screening result."""
+        self.apply_change(("assessment", {
+            "assessment_type": assessment_type,
+            "score": score,
+            "interpretation": interpretation,
+            "timestamp": time.time()
+        }))
+
+    def apply_change(self, change):
+        """Apply one (kind, value) change, remembering it if changes are being tracked."""
+        kind, value = change
+        if kind == "message":
+            self.history.append(value)
+            self.total_messages += 1
+        elif kind == "keywords":
+            self._slide_assessment_window(value)
+        elif kind == "mood":
+            self.mood_history.append(value)
+        elif kind == "assessment":
+            self.assessments.append(value)
+        elif kind == "profile":
+            self.profile = value
+        
+        if self.pending is not None:
+            self.pending.append(change)
+
+    def merge_into(self, current):
+        """Replay this copy's pending changes onto a newer copy of the same session."""
+        for change in self.pending or ():
+            current.apply_change(change)
+        # The summary is derived from the history, so keep whichever copy got further
+        if self.summarized_upto > current.summarized_upto:
+            current.summary = self.summary
+            current.summarized_upto = self.summarized_upto
+        current.last_seen = max(current.last_seen, self.last_seen)
+
+    def _slide_assessment_window(self, turn_keywords):
+        self.assessment_window.append(turn_keywords)
+        for key in turn_keywords:
+            self.assessment_keywords[key] += 1
+            if self.assessment_keywords[key] == 1:
+                self.assessment_counts[key[0]] += 1
+        
+        if len(self.assessment_window) > ASSESSMENT_WINDOW:
+            for key in self.assessment_window.popleft():
+                self.assessment_keywords[key] -= 1
+                if self.assessment_keywords[key] == 0:
+                    del self.assessment_keywords[key]
+                    self.assessment_counts[key[0]] -= 1
+
+    def to_dict(self):
+        """Return the session as a JSON-serializable dict."""
+        return {
+            "session_id": self.session_id,
+            "history": list(self.history),
+            "last_seen": self.last_seen,
+            "total_messages": self.total_messages,
+            "assessment_window": [[list(key) for key in turn] for turn in self.assessment_window],
+            "summary": list(self.summary),
+            "summarized_upto": self.summarized_upto,
+            "profile": self.profile.to_dict() if self.profile is not None else None,
+            "mood_history": list(self.mood_history),
+            "assessments": list(self.assessments)
+        }
+
+    @classmethod
+    def from_dict(cls, data, history_limit=SESSION_HISTORY_LIMIT):
+        """Rebuild a session from to_dict() output."""
+        session = cls(data["session_id"], history_limit)
+        session.history.extend(data.get("history", ()))
+        session.last_seen = data.get("last_seen", session.last_seen)
+        session.total_messages = data.get("total_messages", len(session.history))
+        session.summary.extend(data.get("summary", ()))
+        session.summarized_upto = data.get("summarized_upto", 0)
+        if data.get("profile"):
+            session.profile = UserProfileRecord.from_dict(data["profile"])
+        session.mood_history.extend(data.get("mood_history", ()))
+        session.assessments.extend(data.get("assessments", ()))
+        
+        # The keyword counters are derived from the window, so rebuild them
+        for turn in data.get("assessment_window", ()):
+            turn_keywords = [tuple(key) for key in turn]
+            session.assessment_window.append(turn_keywords)
+            for key in turn_keywords:
+                session.assessment_keywords[key] += 1
+                if session.assessment_keywords[key] == 1:
+                    session.assessment_counts[key[0]] += 1
+        return session
+
+
+class SessionStore:
+    """Thread-safe LRU store of sessions with idle-TTL eviction."""
+
+    # Operations never touch the disk, so they can run on the event loop
+    blocking = False
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL,
+                 history_limit=SESSION_HISTORY_LIMIT):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.history_limit = history_limit
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it if needed."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_seen > self.idle_ttl:
+                # Expired - start fresh
+                del self._sessions[session_id]
+                session = None
+
+            if session is None:
+                session = Session(session_id, self.history_limit)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+
+            session.last_seen = now
+            self._evict(now)
+            return session
+
+    def peek(self, session_id):
+        """Return the session for session_id without creating or touching it."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def save(self, session):
+        """Persist changes to a session (sessions are live objects here, so nothing to do)."""
+
+    def iter_sessions(self):
+        """Yield every stored session, from least to most recently used."""
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            session = self.peek(session_id)
+            if session is not None:
+                yield session
+
+    def remove(self, session_id):
+        """Drop a session from the store."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, now):
+        """Evict idle sessions from the LRU end, then enforce the session cap."""
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_seen <= self.idle_ttl:
+                break
+            del self._sessions[oldest_id]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Session store shared between worker processes through SQLite in WAL mode.
+
+    Each session is one row holding its to_dict() JSON and a version number.
+    get() loads a detached copy that records its changes; save() writes it
+    back only if the row is still at the version it was loaded from, and
+    otherwise replays the changes onto the current row and tries again. A
+    mood check-in saved while a chat turn waits on Gemini therefore survives
+    the turn's save.
+
+    Every call does blocking database I/O, so async code should run it in a
+    thread.
+    """
+
+    blocking = True
+
+    # Prune expired and surplus sessions once every this many saves
+    PRUNE_EVERY = 200
+    # Conflicting concurrent saves of one session before giving up
+    SAVE_ATTEMPTS = 10
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=MAX_SESSIONS,
+                 idle_ttl=SESSION_IDLE_TTL, history_limit=SESSION_HISTORY_LIMIT):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.history_limit = history_limit
+        self._saves = 0
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL, data TEXT NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 1)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it if needed."""
+        now = time.time()
+        session = self._load(session_id)
+        if session is None or now - session.last_seen > self.idle_ttl:
+            # Missing or expired - start fresh (replacing the expired row, if any)
+            version = session.version if session is not None else 0
+            session = Session(session_id, self.history_limit)
+            session.version = version
+        session.last_seen = now
+        session.pending = []
+        return session
+
+    def peek(self, session_id):
+        """Return the stored session for session_id without creating it."""
+        return self._load(session_id)
+
+    def save(self, session):
+        """Write a session back, merging with any save made since it was loaded."""
+        current = session
+        for _ in range(self.SAVE_ATTEMPTS):
+            if self._write(current):
+                break
+            # Someone else saved first: replay our changes onto their version
+            latest = self._load(session.session_id)
+            if latest is None:
+                latest = Session(session.session_id, self.history_limit)  # Pruned meanwhile
+            latest.pending = []
+            current.merge_into(latest)
+            current = latest
+        else:
+            raise RuntimeError(f"Could not save session {session.session_id}: too many concurrent updates")
+        
+        if current is not session:
+            # Hand the merged state back to the caller's copy
+            for name in Session.__slots__:
+                setattr(session, name, getattr(current, name))
+        session.pending = []
+
+    def _write(self, session):
+        """Store a session if its row is still at session.version; returns False on a conflict."""
+        data = json.dumps(session.to_dict(), separators=(",", ":"))
+        with self._lock:
+            if session.version == 0:
+                cursor = self._conn.execute(
+                    "INSERT INTO sessions (session_id, last_seen, data, version) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(session_id) DO NOTHING",
+                    (session.session_id, session.last_seen, data)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE sessions SET last_seen = ?, data = ?, version = version + 1 "
+                    "WHERE session_id = ? AND version = ?",
+                    (session.last_seen, data, session.session_id, session.version)
+                )
+            if cursor.rowcount == 0:
+                return False
+            
+            session.version += 1
+            self._saves += 1
+            if self._saves % self.PRUNE_EVERY == 0:
+                self._prune()
+        return True
+
+    def iter_sessions(self, page_size=200):
+        """Yield every stored session, reading the table a page at a time."""
+        last_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT session_id, data, version FROM sessions WHERE session_id > ? ORDER BY session_id LIMIT ?",
+                    (last_id, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for session_id, data, version in rows:
+                session = Session.from_dict(json.loads(data), self.history_limit)
+                session.version = version
+                yield session
+            last_id = rows[-1][0]
+
+    def remove(self, session_id):
+        """Drop a session from the store."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        session = Session.from_dict(json.loads(row[0]), self.history_limit)
+        session.version = row[1]
+        return session
+
+    def _prune(self):
+        """Delete idle sessions, then the least recently seen ones beyond the cap."""
+        self._conn.execute("DELETE FROM sessions WHERE last_seen < ?", (time.time() - self.idle_ttl,))
+        self._conn.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Return the session store selected by SESSION_BACKEND."""
+    if backend == "sqlite":
+        print(f"Using SQLite session store at {SESSION_DB_PATH}")
+        return SQLiteSessionStore()
+    if backend != "memory":
+        print(f"Unknown SESSION_BACKEND '{backend}', using in-memory sessions")
+    return SessionStore()
@@ -0,0 +1,90 @@
+"""Request coalescing: concurrent duplicate chat turns share one in-flight call."""
+
+import asyncio
+import hashlib
+
+
+def message_key(session_id, message):
+    """Key identifying a chat turn: the session plus a hash of the message text."""
+    return (session_id, hashlib.sha256(message.encode("utf-8")).hexdigest())
+
+
+class _SharedStream:
+    """Chunks produced so far by one in-flight stream, replayed to every subscriber."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+
+class SingleFlight:
+    """Runs at most one call (or stream) per key at a time.
+
+    Callers that arrive while a call for the same key is in flight wait for
+    and share its result instead of starting another one. The key is
+    released as soon as the call finishes, so later retries run normally.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        # The event loop only keeps weak references to tasks, so pumps are held
+        # here until they finish, even after every subscriber has gone
+        self._pumps = set()
+
+    async def do(self, key, make_call):
+        """Await make_call() once for all concurrent callers with the same key."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # Shield so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, key, make_stream):
+        """Iterate make_stream() once and fan its items out to all concurrent subscribers."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            pump = asyncio.ensure_future(self._pump(key, shared, make_stream()))
+            self._pumps.add(pump)
+            pump.add_done_callback(self._pumps.discard)
+
+        index = 0
+        while True:
+            async with shared.changed:
+                await shared.changed.wait_for(lambda: index < len(shared.chunks) or shared.done)
+                pending = shared.chunks[index:]
+                finished = shared.done
+
+            for chunk in pending:
+                yield chunk
+            index += len(pending)
+
+            if finished and index == len(shared.chunks):
+                if shared.error is not None:
+                    raise shared.error
+                return
+
+    def in_flight(self):
+        """Return the number of calls and streams currently in flight."""
+        return len(self._calls) + len(self._streams)
+
+    async def _pump(self, key, shared, stream):
+        try:
+            async for chunk in stream:
+                async with shared.changed:
+                    shared.chunks.append(chunk)
+                    shared.changed.notify_all()
+        except Exception as e:
+            shared.error = e
+        finally:
+            self._streams.pop(key, None)
+            async with shared.changed:
+                shared.done = True
+                shared.changed.notify_all()
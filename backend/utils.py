@@ -1,51 +1,31 @@
 """Utility functions for the mental health chatbot."""
 
-def sentiment_score(text):
+from backend.keywords import match_keywords
+
+def sentiment_score(text, matches=None):
     """
     Simple sentiment analysis function.
     Returns a score between -1 (negative) and 1 (positive).
     """
     # This is a very simplified version - in production, use a proper NLP model
-    negative_words = ["sad", "depressed", "anxious", "worried", "hopeless", 
-                      "stressed", "overwhelmed", "tired", "exhausted", "lonely"]
-    positive_words = ["happy", "calm", "peaceful", "hopeful", "excited", 
-                      "grateful", "relaxed", "confident", "loved", "supported"]
-    
-    text = text.lower()
-    neg_count = sum(word in text for word in negative_words)
-    pos_count = sum(word in text for word in positive_words)
+    if matches is None:
+        matches = match_keywords(text)
+    neg_count = matches.count("sentiment_negative")
+    pos_count = matches.count("sentiment_positive")
     
     if neg_count == 0 and pos_count == 0:
         return 0
     
     return (pos_count - neg_count) / (pos_count + neg_count)
 
-def detect_crisis_language(text):
+def detect_crisis_language(text, matches=None):
     """
     Detects potential crisis keywords in text.
     Returns True if crisis language is detected.
     """
-    crisis_keywords = [
-        # Direct self-harm indicators
-        "suicide", "kill myself", "end my life", "want to die", 
-        "hurt myself", "self harm", "cutting myself", "no reason to live",
-        
-        # New patterns from examples
-        "don't want to live like this anymore", "don't want to live anymore",
-        "everything feels pointless", "everything is pointless",
-        "people would be better off without me", "better off without me",
-        "feel like I can't keep going", "can't keep going",
-        "wish I could just disappear", "want to disappear",
-        "no point in living", "life is meaningless",
-        
-        # Indirect but concerning patterns
-        "give up completely", "nothing matters anymore",
-        "tired of everything", "can't take it anymore",
-        "world without me", "everyone hates me"
-    ]
-    
-    text = text.lower()
-    return any(keyword in text for keyword in crisis_keywords)
+    if matches is None:
+        matches = match_keywords(text)
+    return matches.has("crisis")
 
 def get_crisis_resources():
     """Return crisis support resources for US and India."""
@@ -64,3 +44,14 @@ def get_crisis_resources():
         },
         "message": "Please reach out to a trusted friend, family member, or mental health professional. You are not alone, and help is available. 🌸💕"
     }
+
+def age_bucket(age):
+    """Map an age to the communication-style bucket used for prompts and caching."""
+    if age <= 12:
+        return "child"
+    elif age <= 19:
+        return "teen"
+    elif age <= 60:
+        return "adult"
+    else:
+        return "senior"
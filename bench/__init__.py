@@ -0,0 +1 @@
+"""Load tests and microbenchmarks for the MindfulCompanion backend."""
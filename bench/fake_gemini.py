@@ -0,0 +1,81 @@
+"""Local stand-in for the Gemini API, used by the load test.
+
+Implements generateContent and streamGenerateContent (SSE) with a
+configurable delay, so backend overhead can be measured without network
+noise or quota. Context caching is rejected, which makes the backend fall
+back to sending the full prompt.
+
+Settings (environment variables):
+    FAKE_GEMINI_LATENCY      seconds before the reply / first chunk (default 0.3)
+    FAKE_GEMINI_CHUNKS       chunks per streamed reply (default 6)
+    FAKE_GEMINI_CHUNK_DELAY  seconds between streamed chunks (default 0.05)
+
+Run: uvicorn bench.fake_gemini:app --port 8090
+"""
+
+import os
+import json
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_GEMINI_LATENCY = float(os.getenv("FAKE_GEMINI_LATENCY", "0.3"))
+FAKE_GEMINI_CHUNKS = int(os.getenv("FAKE_GEMINI_CHUNKS", "6"))
+FAKE_GEMINI_CHUNK_DELAY = float(os.getenv("FAKE_GEMINI_CHUNK_DELAY", "0.05"))
+
+REPLY = (
+    "I hear you, and I'm really glad you shared that with me. "
+    "It sounds like a lot to carry right now. "
+    "What feels heaviest for you at the moment?"
+)
+
+app = FastAPI()
+
+
+def _response_payload(text):
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP",
+            "index": 0
+        }],
+        "usageMetadata": {"promptTokenCount": 400, "candidatesTokenCount": 40, "totalTokenCount": 440}
+    }
+
+
+def _split_reply(text, parts):
+    words = text.split(" ")
+    size = max(1, -(-len(words) // parts))
+    return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+
+@app.post("/{version}/models/{model_action}")
+async def models(version: str, model_action: str):
+    """Handle models/{model}:generateContent and :streamGenerateContent."""
+    _, _, action = model_action.partition(":")
+
+    if action == "generateContent":
+        await asyncio.sleep(FAKE_GEMINI_LATENCY)
+        return JSONResponse(_response_payload(REPLY))
+
+    if action == "streamGenerateContent":
+        async def events():
+            await asyncio.sleep(FAKE_GEMINI_LATENCY)
+            for i, chunk in enumerate(_split_reply(REPLY, FAKE_GEMINI_CHUNKS)):
+                if i:
+                    await asyncio.sleep(FAKE_GEMINI_CHUNK_DELAY)
+                yield f"data: {json.dumps(_response_payload(chunk))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    if action == "countTokens":
+        return {"totalTokens": 400}
+
+    raise HTTPException(status_code=404, detail=f"Unsupported action '{action}'")
+
+
+@app.post("/{version}/cachedContents")
+async def cached_contents(version: str):
+    """Context caching is not emulated."""
+    raise HTTPException(status_code=400, detail="Context caching is not supported by the fake server")
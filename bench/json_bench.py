@@ -0,0 +1,100 @@
+"""Benchmark JSON response encoding for /chat payloads.
+
+Compares FastAPI's default path for a returned dict (jsonable_encoder,
+then JSONResponse with the stdlib json module) against FastJSONResponse
+with the pre-encoded constant fragments the API uses. Reports
+microseconds per response and the speed-up for a plain reply, a crisis
+reply and a crisis reply with a suggested assessment.
+
+Usage:
+    python -m bench.json_bench --number 20000
+"""
+
+import json
+import timeit
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from backend import json_response
+from backend.assessment import MentalHealthScreening
+from backend.json_response import FastJSONResponse, fragment
+from backend.utils import get_crisis_resources
+
+REPLY = (
+    "I hear how heavy things feel right now, and I'm really glad you told me. "
+    "You don't have to carry this alone - would you like to talk about what's been happening? 💙"
+)
+
+
+def build_payloads():
+    """Return {name: (plain dict payload, payload with fragments)} for each /chat shape."""
+    crisis_resources = get_crisis_resources()
+    suggested = {
+        "type": "phq9",
+        "name": "Depression Screening",
+        "questions": MentalHealthScreening.get_phq9_questions()
+    }
+    crisis_fragment = fragment(crisis_resources)
+    suggested_fragment = fragment(suggested)
+
+    base = {"response": REPLY, "sentiment": -0.6, "is_crisis": False}
+    crisis = dict(base, is_crisis=True)
+    return {
+        "reply": (dict(base), dict(base)),
+        "crisis": (
+            dict(crisis, crisis_resources=crisis_resources),
+            dict(crisis, crisis_resources=crisis_fragment)
+        ),
+        "crisis+assessment": (
+            dict(crisis, crisis_resources=crisis_resources, suggested_assessment=suggested),
+            dict(crisis, crisis_resources=crisis_fragment, suggested_assessment=suggested_fragment)
+        )
+    }
+
+
+def _bench(func, number):
+    """Return the best-of-5 time per call, in microseconds."""
+    timings = timeit.repeat(func, number=number, repeat=5)
+    return min(timings) / number * 1e6
+
+
+def run_benchmarks(number):
+    """Time both encoders per payload; returns {name: {"default": us, "fast": us}}."""
+    results = {}
+    for name, (plain, fragmented) in build_payloads().items():
+        # Both paths must put the same document on the wire
+        assert json.loads(JSONResponse(jsonable_encoder(plain)).body) == json.loads(FastJSONResponse(fragmented).body)
+        results[name] = {
+            "default": _bench(lambda: JSONResponse(jsonable_encoder(plain)), number),
+            "fast": _bench(lambda: FastJSONResponse(fragmented), number)
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON response encoding for /chat payloads.")
+    parser.add_argument("--number", type=int, default=20000, help="iterations per timing run")
+    parser.add_argument("--json", help="also write the results to this file as JSON")
+    args = parser.parse_args(argv)
+
+    orjson = json_response.orjson
+    if orjson is None:
+        print("orjson is not installed - FastJSONResponse is using the stdlib fallback")
+    else:
+        fragments = "with" if json_response._Fragment is not None else "without"
+        print(f"orjson {orjson.__version__} ({fragments} Fragment support)")
+
+    results = run_benchmarks(args.number)
+    print(f"{'payload':<20}{'default us':>12}{'fast us':>10}{'speed-up':>10}")
+    for name, row in results.items():
+        print(f"{name:<20}{row['default']:>12.2f}{row['fast']:>10.2f}{row['default'] / row['fast']:>9.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
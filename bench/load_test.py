@@ -0,0 +1,221 @@
+"""Load test for the backend API.
+
+Starts the fake Gemini server and backend.api:app (unless --backend-url
+points at a running backend), then drives /chat, /process-assessment and
+/set-profile (and optionally /chat/stream, read to the last event) at each
+concurrency level and reports throughput and p50/p95/p99 latency.
+
+Usage:
+    python -m bench.load_test --concurrency 1,8,32 --requests 200
+    python -m bench.load_test --backend-url http://127.0.0.1:8000 --endpoints chat,chat-stream
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+CHAT_MESSAGES = (
+    "hello",
+    "I've been feeling really anxious about my exams",
+    "I feel sad and lonely lately",
+    "work has been so stressful this week",
+    "can you give me a self care tip",
+    "I can't sleep and I keep worrying about everything",
+    "thank you, that helps",
+    "I don't know why I feel so tired and hopeless",
+)
+
+ENDPOINTS = ("chat", "process-assessment", "set-profile")
+OPTIONAL_ENDPOINTS = ("chat-stream",)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def make_request(endpoint, i):
+    """Return (path, json body) for request number i."""
+    if endpoint in ("chat", "chat-stream"):
+        path = "/chat" if endpoint == "chat" else "/chat/stream"
+        # One session per request so duplicate-turn coalescing doesn't flatter the numbers
+        return path, {"message": random.choice(CHAT_MESSAGES), "session_id": f"bench-{i}"}
+    if endpoint == "process-assessment":
+        return "/process-assessment", {
+            "assessment_type": "phq9",
+            "responses": [random.randint(0, 3) for _ in range(9)],
+            "session_id": f"bench-{i}"
+        }
+    return "/set-profile", {
+        "name": f"Bench {i}",
+        "age": random.randint(10, 80),
+        "goals": ["Reduce stress"],
+        "current_mood": random.choice(("Bad", "Neutral", "Good")),
+        "session_id": f"bench-{i}"
+    }
+
+
+async def run_level(base_url, endpoint, concurrency, total):
+    """Send total requests with concurrency workers; return a result row."""
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal next_index, errors
+            while next_index < total:
+                i = next_index
+                next_index += 1
+                path, body = make_request(endpoint, i)
+                start = time.perf_counter()
+                try:
+                    async with client.stream("POST", path, json=body) as response:
+                        await response.aread()
+                        ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+
+def wait_for_health(url, timeout=30.0):
+    """Poll url until it answers 200, or raise after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+def start_servers(args):
+    """Start the fake Gemini server and the backend; return (processes, backend url)."""
+    fake_env = dict(os.environ,
+                    FAKE_GEMINI_LATENCY=str(args.latency),
+                    FAKE_GEMINI_CHUNKS=str(args.chunks),
+                    FAKE_GEMINI_CHUNK_DELAY=str(args.chunk_delay))
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.fake_gemini:app",
+         "--port", str(args.fake_port), "--log-level", "warning"],
+        env=fake_env
+    )
+
+    backend_env = dict(os.environ,
+                       GEMINI_API_KEY="bench-key",
+                       GEMINI_BASE_URL=f"http://127.0.0.1:{args.fake_port}",
+                       TEST_MODE="false")
+    if args.workers > 1:
+        backend_env.setdefault("SESSION_BACKEND", "sqlite")
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api:app",
+         "--port", str(args.backend_port), "--workers", str(args.workers), "--log-level", "warning"],
+        env=backend_env
+    )
+
+    processes = [fake, backend]
+    try:
+        wait_for_health(f"http://127.0.0.1:{args.fake_port}/docs")
+        wait_for_health(f"http://127.0.0.1:{args.backend_port}/health")
+    except RuntimeError:
+        stop_servers(processes)
+        raise
+    return processes, f"http://127.0.0.1:{args.backend_port}"
+
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def print_table(rows):
+    print(f"{'endpoint':<20}{'conc':>6}{'reqs':>7}{'errs':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(f"{row['endpoint']:<20}{row['concurrency']:>6}{row['requests']:>7}{row['errors']:>6}"
+              f"{row['throughput']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the MindfulCompanion backend.")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoints to drive")
+    parser.add_argument("--backend-url", help="use a running backend instead of starting one")
+    parser.add_argument("--backend-port", type=int, default=8001)
+    parser.add_argument("--fake-port", type=int, default=8090)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started backend")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake Gemini reply latency in seconds")
+    parser.add_argument("--chunks", type=int, default=6, help="fake Gemini chunks per streamed reply")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="fake Gemini delay between chunks")
+    parser.add_argument("--json", help="also write the results to this file as JSON")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    unknown = set(endpoints) - set(ENDPOINTS) - set(OPTIONAL_ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    processes = []
+    base_url = args.backend_url
+    if base_url is None:
+        processes, base_url = start_servers(args)
+
+    rows = []
+    try:
+        for endpoint in endpoints:
+            for level in levels:
+                rows.append(asyncio.run(run_level(base_url, endpoint, level, args.requests)))
+    finally:
+        stop_servers(processes)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
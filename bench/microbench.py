@@ -0,0 +1,115 @@
+"""Microbenchmarks for the per-message hot paths.
+
+Times detect_crisis_language, sentiment_score, analyze_message and
+GeminiAI._get_fallback_response over a fixed message corpus and reports
+microseconds per call. Results can be saved as a baseline and later runs
+compared against it, failing when a benchmark slows down past a threshold.
+
+Usage:
+    python -m bench.microbench --save bench_baseline.json
+    python -m bench.microbench --compare bench_baseline.json --threshold 0.25
+"""
+
+import os
+import sys
+import json
+import random
+import timeit
+import argparse
+
+# Fallback replies only - never call the real API from a benchmark
+os.environ.setdefault("TEST_MODE", "true")
+
+from backend.ai_service import GeminiAI
+from backend.analysis import analyze_message
+from backend.utils import detect_crisis_language, sentiment_score
+
+MESSAGES = (
+    "hi there",
+    "I feel sad and lonely and nobody understands me",
+    "I'm so anxious about tomorrow, my heart keeps racing",
+    "work is really stressful and I can't relax",
+    "thank you so much, that was helpful",
+    "can you tell me a story to help me relax",
+    "I want to end it all, I can't go on",
+    "just okay I guess, nothing special today",
+    "I'm studying for exams and I feel like a failure",
+    "I have been feeling hopeless and worthless for weeks and I don't enjoy anything anymore " * 3,
+)
+
+
+def _bench(func, number):
+    """Return the best-of-5 time per call, in microseconds."""
+    timings = timeit.repeat(func, number=number, repeat=5)
+    return min(timings) / number * 1e6
+
+
+def run_benchmarks(number):
+    """Run every benchmark; returns {name: microseconds per call}."""
+    random.seed(0)
+    ai = GeminiAI()
+    analyses = [analyze_message(message) for message in MESSAGES]
+
+    def crisis():
+        for message in MESSAGES:
+            detect_crisis_language(message)
+
+    def sentiment():
+        for message in MESSAGES:
+            sentiment_score(message)
+
+    def analysis():
+        for message in MESSAGES:
+            analyze_message(message)
+
+    def fallback():
+        # No session, so nothing accumulates in history between runs
+        for message, message_analysis in zip(MESSAGES, analyses):
+            ai._get_fallback_response(message, message_analysis.is_crisis, None, message_analysis)
+
+    per_message = len(MESSAGES)
+    return {
+        "detect_crisis_language": _bench(crisis, number) / per_message,
+        "sentiment_score": _bench(sentiment, number) / per_message,
+        "analyze_message": _bench(analysis, number) / per_message,
+        "_get_fallback_response": _bench(fallback, number) / per_message
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark the chat hot paths.")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per timing run")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown versus the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.number)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    regressions = []
+    print(f"{'benchmark':<26}{'us/call':>10}{'baseline':>10}{'change':>9}")
+    for name, value in results.items():
+        line = f"{name:<26}{value:>10.2f}"
+        if name in baseline:
+            change = value / baseline[name] - 1
+            line += f"{baseline[name]:>10.2f}{change:>+9.0%}"
+            if change > args.threshold:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,53 @@
 #!/usr/bin/env python3
 """
 Combined server that runs both FastAPI backend and Streamlit frontend
-in a single process for single URL deployment.
+for single URL deployment.
+
+The backend runs as a managed uvicorn subprocess (optionally with several
+workers) and Streamlit starts alongside it, so cold start takes as long as
+the slower of the two rather than a fixed delay. The backend is restarted
+if it dies; when Streamlit exits, everything shuts down.
 """
 
 import os
 import sys
-import threading
 import time
-import subprocess
 import signal
-from pathlib import Path
+import subprocess
+import urllib.request
+
+BACKEND_HOST = "127.0.0.1"
+BACKEND_PORT = 8000
+BACKEND_URL = f"http://{BACKEND_HOST}:{BACKEND_PORT}"
+BACKEND_WORKERS = int(os.environ.get("BACKEND_WORKERS", "1"))
+BACKEND_STARTUP_TIMEOUT = float(os.environ.get("BACKEND_STARTUP_TIMEOUT", "60"))  # seconds
 
 def start_backend():
-    """Start the FastAPI backend server."""
-    print("🚀 Starting FastAPI backend...")
-    
-    # Import and start FastAPI app
-    from backend.api import app
-    import uvicorn
-    
+    """Start the FastAPI backend as a uvicorn subprocess."""
+    print(f"🚀 Starting FastAPI backend with {BACKEND_WORKERS} worker(s)...")
+
+    env = dict(os.environ)
+    if BACKEND_WORKERS > 1:
+        # Workers only see each other's sessions through a shared store
+        env.setdefault("SESSION_BACKEND", "sqlite")
+
     # Run backend on internal port
-    uvicorn.run(
-        app,
-        host="127.0.0.1",
-        port=8000,
-        log_level="info"
-    )
+    cmd = [
+        sys.executable, "-m", "uvicorn", "backend.api:app",
+        "--host", BACKEND_HOST,
+        "--port", str(BACKEND_PORT),
+        "--workers", str(BACKEND_WORKERS),
+        "--log-level", "info"
+    ]
+    return subprocess.Popen(cmd, env=env)
 
 def start_frontend():
-    """Start the Streamlit frontend."""
+    """Start the Streamlit frontend as a subprocess."""
     print("🎨 Starting Streamlit frontend...")
-    
+
     # Set backend URL to local backend
-    os.environ["BACKEND_URL"] = "http://127.0.0.1:8000"
-    
+    env = dict(os.environ, BACKEND_URL=BACKEND_URL)
+
     # Get port from environment (Render sets this)
     port_env = os.environ.get("PORT", "10000")
     # Handle case where PORT might be literal '$PORT' string
@@ -46,7 +59,7 @@ def start_frontend():
         except ValueError:
             print(f"⚠️ Invalid PORT value '{port_env}', using default 10000")
             port = 10000
-    
+
     # Start Streamlit
     cmd = [
         sys.executable, "-m", "streamlit", "run", "app.py",
@@ -59,38 +72,75 @@ def start_frontend():
         "--runner.magicEnabled", "true",
         "--logger.level", "error"
     ]
-    
-    subprocess.run(cmd)
+    return subprocess.Popen(cmd, env=env)
+
+def wait_for_backend(backend, timeout=BACKEND_STARTUP_TIMEOUT):
+    """Poll /health with exponential backoff until the backend answers.
+
+    Returns True once healthy, False on timeout or if the process exits.
+    """
+    started = time.monotonic()
+    delay = 0.05
+    while time.monotonic() - started < timeout:
+        if backend.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{BACKEND_URL}/health", timeout=2) as response:
+                if response.status == 200:
+                    print(f"✅ Backend is ready after {time.monotonic() - started:.1f}s")
+                    return True
+        except OSError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    return False
+
+def stop(process):
+    """Terminate a subprocess, killing it if it doesn't exit promptly."""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
 
 def main():
     """Main function to coordinate both servers."""
     print("🌟 Starting MindfulCompanion - Single URL Deployment")
-    
-    # Start backend in a separate thread
-    backend_thread = threading.Thread(target=start_backend, daemon=True)
-    backend_thread.start()
-    
-    # Wait for backend to start
-    print("⏳ Waiting for backend to initialize...")
-    time.sleep(8)
-    
-    # Check if backend is responding
-    try:
-        import requests
-        response = requests.get("http://127.0.0.1:8000/health", timeout=5)
-        if response.status_code == 200:
-            print("✅ Backend is ready!")
-        else:
-            print("⚠️ Backend may not be fully ready, but proceeding...")
-    except Exception as e:
-        print(f"⚠️ Backend check failed: {e}, but proceeding...")
-    
-    # Start frontend (this will block and handle the main port)
+
+    # Start both at once - Streamlit doesn't need the backend until the first page load
+    backend = start_backend()
+    frontend = start_frontend()
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, shutdown)
+
     try:
-        start_frontend()
+        print("⏳ Waiting for backend to initialize...")
+        if not wait_for_backend(backend):
+            print("⚠️ Backend is not healthy yet, but proceeding...")
+
+        # Supervise: restart the backend if it dies, stop when the frontend exits
+        restart_delay = 1.0
+        while frontend.poll() is None:
+            if backend.poll() is not None:
+                print(f"⚠️ Backend exited with code {backend.returncode}, restarting in {restart_delay:.0f}s...")
+                time.sleep(restart_delay)
+                restart_delay = min(restart_delay * 2, 30.0)
+                backend = start_backend()
+                if wait_for_backend(backend):
+                    restart_delay = 1.0
+            time.sleep(1)
     except KeyboardInterrupt:
         print("\n🛑 Shutting down gracefully...")
-        sys.exit(0)
+    finally:
+        stop(frontend)
+        stop(backend)
+
+    # Negative codes mean we terminated it ourselves
+    sys.exit(max(frontend.returncode or 0, 0))
 
 if __name__ == "__main__":
     main()
@@ -4,26 +4,37 @@
 echo "🚀 Starting MindfulCompanion single URL deployment..."
 
 # Start backend API in background
-echo "📡 Starting backend API..."
-uvicorn backend.api:app --host 127.0.0.1 --port 8000 &
-BACKEND_PID=$!
-
-# Wait for backend to start
-echo "⏳ Waiting for backend to initialize..."
-sleep 5
-
-# Check if backend is running
-if curl -s http://127.0.0.1:8000/health > /dev/null; then
-    echo "✅ Backend API is running"
-else
-    echo "❌ Backend failed to start"
-    exit 1
+# Several workers need a shared session store, so default to SQLite in that case
+BACKEND_WORKERS=${BACKEND_WORKERS:-1}
+if [ "$BACKEND_WORKERS" -gt 1 ] && [ -z "$SESSION_BACKEND" ]; then
+    export SESSION_BACKEND=sqlite
 fi
+echo "📡 Starting backend API with $BACKEND_WORKERS worker(s)..."
+uvicorn backend.api:app --host 127.0.0.1 --port 8000 --workers $BACKEND_WORKERS &
+BACKEND_PID=$!
 
-# Start Streamlit frontend on the main port
+# Start Streamlit frontend on the main port alongside the backend
 echo "🎨 Starting frontend..."
 export BACKEND_URL="http://127.0.0.1:8000"
-streamlit run app.py --server.port $PORT --server.address 0.0.0.0 --server.headless true --server.enableCORS false --server.enableXsrfProtection false
+streamlit run app.py --server.port $PORT --server.address 0.0.0.0 --server.headless true --server.enableCORS false --server.enableXsrfProtection false &
+FRONTEND_PID=$!
+
+# Wait for the backend to report healthy, backing off between polls
+echo "⏳ Waiting for backend to initialize..."
+DELAY_MS=100
+WAITED_MS=0
+until curl -sf http://127.0.0.1:8000/health > /dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null || [ $WAITED_MS -ge $(( ${BACKEND_STARTUP_TIMEOUT:-60} * 1000 )) ]; then
+        echo "❌ Backend failed to start"
+        kill $FRONTEND_PID $BACKEND_PID 2>/dev/null
+        exit 1
+    fi
+    sleep "$(printf '%d.%03d' $((DELAY_MS / 1000)) $((DELAY_MS % 1000)))"
+    WAITED_MS=$((WAITED_MS + DELAY_MS))
+    DELAY_MS=$((DELAY_MS * 2 > 1000 ? 1000 : DELAY_MS * 2))
+done
+echo "✅ Backend API is running"
 
 # If streamlit exits, kill backend
+wait $FRONTEND_PID
 kill $BACKEND_PID